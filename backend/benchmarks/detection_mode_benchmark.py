@@ -0,0 +1,118 @@
+"""Compare per-job latency and cost of per-frame and mosaic object detection.
+
+Usage (from the backend directory):
+    python benchmarks/detection_mode_benchmark.py [--video path/to/clip.mp4] [--offline]
+
+Frames are decoded once and then run through VideoProcessor.detect_objects in
+each mode. With --offline the vision model is replaced by a stub that answers
+after --call-latency seconds, which measures call counts, upload bytes and
+scheduling without spending API credits; otherwise NEBIUS_API_KEY is used.
+
+Cost uses the token counts the API reports, or an estimate of one token per
+28x28 image patch plus one per four prompt characters when it reports none.
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_sampling_benchmark import generate_clip
+from services.video_processor import VideoProcessor, shutdown_decode_pool
+
+class RecordingCompletions:
+    """Stands in for client.chat.completions and records every request"""
+
+    def __init__(self, create, offline_latency: float = None):
+        self._create = create
+        self.offline_latency = offline_latency
+        self.calls: List[Dict] = []
+
+    async def create(self, **kwargs):
+        text_part, image_part = kwargs["messages"][0]["content"]
+        raw_image = base64.b64decode(image_part["image_url"]["url"].split(",", 1)[1])
+        height, width = cv2.imdecode(np.frombuffer(raw_image, dtype=np.uint8), cv2.IMREAD_COLOR).shape[:2]
+
+        if self.offline_latency is not None:
+            await asyncio.sleep(self.offline_latency)
+            response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="[]"))], usage=None)
+        else:
+            response = await self._create(**kwargs)
+
+        usage = getattr(response, "usage", None)
+        self.calls.append({
+            "image_bytes": len(raw_image),
+            "prompt_tokens": usage.prompt_tokens if usage else (width // 28) * (height // 28) + len(text_part["text"]) // 4,
+            "completion_tokens": usage.completion_tokens if usage else 0
+        })
+        return response
+
+async def run_mode(processor: VideoProcessor, frames: List[Dict], mode: str, offline_latency: float) -> Dict:
+    recorder = RecordingCompletions(processor.client.chat.completions.create, offline_latency)
+    real_client = processor.client
+    processor.client = SimpleNamespace(chat=SimpleNamespace(completions=recorder))
+
+    try:
+        start = time.perf_counter()
+        objects = await processor.detect_objects(frames, detection_mode=mode)
+        elapsed = time.perf_counter() - start
+    finally:
+        processor.client = real_client
+
+    return {
+        "seconds": elapsed,
+        "calls": len(recorder.calls),
+        "objects": len(objects),
+        "image_bytes": sum(call["image_bytes"] for call in recorder.calls),
+        "prompt_tokens": sum(call["prompt_tokens"] for call in recorder.calls),
+        "completion_tokens": sum(call["completion_tokens"] for call in recorder.calls)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", help="Existing clip to benchmark against")
+    parser.add_argument("--frame-budget", type=int, default=8)
+    parser.add_argument("--offline", action="store_true", help="Use a stub vision model instead of the API")
+    parser.add_argument("--call-latency", type=float, default=3.0, help="Stub response time in seconds (--offline)")
+    parser.add_argument("--input-price", type=float, default=0.13, help="USD per million prompt tokens")
+    parser.add_argument("--output-price", type=float, default=0.40, help="USD per million completion tokens")
+    args = parser.parse_args()
+
+    video_path = args.video
+    if not video_path:
+        video_path = os.path.join(tempfile.mkdtemp(), "bench_1080p_60s.mp4")
+        print(f"Generating synthetic 60s 1080p clip at {video_path} ...")
+        generate_clip(video_path)
+
+    processor = VideoProcessor()
+    # Both modes must see the same frames cold, so detections are never served from the cache
+    processor.detection_cache = None
+    offline_latency = args.call_latency if args.offline else None
+
+    async def run():
+        frames = await processor.extract_frames(video_path, args.frame_budget)
+        print(f"\nDecoded {len(frames)} frames\n")
+        print(f"  {'mode':<8} {'latency':>9} {'calls':>6} {'objects':>8} {'image KB':>9} {'tokens in':>10} {'tokens out':>11} {'cost USD':>9}")
+        for mode in ("frame", "mosaic"):
+            result = await run_mode(processor, frames, mode, offline_latency)
+            cost = (result["prompt_tokens"] * args.input_price + result["completion_tokens"] * args.output_price) / 1_000_000
+            print(f"  {mode:<8} {result['seconds']:8.2f}s {result['calls']:>6} {result['objects']:>8} "
+                  f"{result['image_bytes'] / 1024:>9.0f} {result['prompt_tokens']:>10} {result['completion_tokens']:>11} {cost:>9.5f}")
+
+    try:
+        asyncio.run(run())
+    finally:
+        shutdown_decode_pool()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Compare frame decode time of the old read-every-frame loop against sample_frames.
+
+Usage (from the backend directory):
+    python benchmarks/frame_sampling_benchmark.py [--video path/to/clip.mp4]
+
+Without --video a synthetic 60-second 1080p clip is generated first.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.frame_sampler import sample_frames
+
+def generate_clip(path: str, seconds: int = 60, fps: int = 30, width: int = 1920, height: int = 1080):
+    """Write a synthetic clip with a moving pattern so the encoder can't skip frames"""
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError("Could not open video writer")
+
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 64, size=(height, width, 3), dtype=np.uint8)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+
+    for index in range(seconds * fps):
+        shift = (index * 8) % width
+        gradient = np.roll(x, shift).astype(np.uint8)
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[..., 0] = gradient
+        frame[..., 1] = gradient[::-1]
+        frame[..., 2] = (index * 3) % 256
+        frame = cv2.add(frame, np.roll(noise, index, axis=0))
+        cv2.putText(frame, f"{index / fps:.2f}s", (80, 200), cv2.FONT_HERSHEY_SIMPLEX, 4, (255, 255, 255), 8)
+        writer.write(frame)
+
+    writer.release()
+
+def read_loop(video_path: str, frame_interval: int, limit: int) -> List[int]:
+    """The original extract_frames loop: read() every frame, keep every Nth"""
+
+    cap = cv2.VideoCapture(video_path)
+    kept = []
+    frame_count = 0
+    while cap.isOpened() and len(kept) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if frame_count % frame_interval == 0:
+            kept.append(frame_count)
+        frame_count += 1
+    cap.release()
+    return kept
+
+def sampled(video_path: str, frame_indices: List[int], seek_gap: int) -> List[int]:
+    """Decode only the selected frames with sample_frames"""
+
+    cap = cv2.VideoCapture(video_path)
+    kept = [index for index, _ in sample_frames(cap, frame_indices, seek_gap)]
+    cap.release()
+    return kept
+
+def timed(label: str, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {elapsed:8.3f}s  ({len(result)} frames)")
+    return elapsed, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", help="Existing clip to benchmark against")
+    parser.add_argument("--seek-gap-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    video_path = args.video
+    if not video_path:
+        video_path = os.path.join(tempfile.mkdtemp(), "bench_1080p_60s.mp4")
+        print(f"Generating synthetic 60s 1080p clip at {video_path} ...")
+        generate_clip(video_path)
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+
+    frame_interval = max(1, int(fps * 2))
+    seek_gap = max(1, int(fps * args.seek_gap_seconds))
+    print(f"Clip: {width}x{height}, {fps:.1f} FPS, {total_frames} frames")
+
+    scenarios = [
+        ("first 5 frames @ 2s", 5),
+        ("whole clip @ 2s", total_frames // frame_interval + 1),
+    ]
+
+    for name, limit in scenarios:
+        indices = [i * frame_interval for i in range(limit) if i * frame_interval < total_frames]
+        print(f"\n{name}:")
+        legacy_time, legacy_frames = timed("read() loop", read_loop, video_path, frame_interval, limit)
+        sampled_time, sampled_frames = timed("sample_frames", sampled, video_path, indices, seek_gap)
+        if legacy_frames != sampled_frames:
+            print("  WARNING: selected frame indices differ")
+        print(f"  speedup: {legacy_time / sampled_time:.2f}x")
+
+if __name__ == "__main__":
+    main()
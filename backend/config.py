@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -88,4 +89,95 @@ print(f"Config loaded - EBAY_APP_ID: {'✓' if EBAY_APP_ID else '✗'}")
 print(f"Config loaded - EBAY_CERT_ID: {'✓' if EBAY_CERT_ID else '✗'}")
 print(f"Config loaded - EBAY_DEV_ID: {'✓' if EBAY_DEV_ID else '✗'}")
 print(f"Config loaded - EBAY_SANDBOX_AUTH_TOKEN: {'✓' if EBAY_SANDBOX_AUTH_TOKEN else '✗'}")
-print(f"eBay Sandbox Mode: {'✓' if EBAY_SANDBOX else '✗'}")
\ No newline at end of file
+print(f"eBay Sandbox Mode: {'✓' if EBAY_SANDBOX else '✗'}")
+
+# Sell mode video pipeline configuration
+VIDEO_SPOOL_DIR = os.getenv("VIDEO_SPOOL_DIR", str(Path(tempfile.gettempdir()) / "smartscape_spool"))
+VIDEO_UPLOAD_CHUNK_SIZE = int(os.getenv("VIDEO_UPLOAD_CHUNK_SIZE", str(1024 * 1024)))  # 1MB
+VIDEO_MAX_UPLOAD_BYTES = int(os.getenv("VIDEO_MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))  # 100MB
+VIDEO_SEEK_MIN_GAP_SECONDS = float(os.getenv("VIDEO_SEEK_MIN_GAP_SECONDS", "1.0"))  # Seek instead of grab() across longer gaps
+
+# Frame budget: how many frames of each video are sent to the vision model
+DEPLOYMENT_TIER = os.getenv("DEPLOYMENT_TIER", "free")
+FRAME_BUDGET_TIERS = {
+    "free": {"default": 5, "max": 8},
+    "standard": {"default": 8, "max": 16},
+    "pro": {"default": 12, "max": 32},
+}
+TIER_FRAME_BUDGET = FRAME_BUDGET_TIERS.get(DEPLOYMENT_TIER, FRAME_BUDGET_TIERS["free"])
+FRAME_BUDGET_DEFAULT = int(os.getenv("FRAME_BUDGET_DEFAULT", str(TIER_FRAME_BUDGET["default"])))
+FRAME_BUDGET_MAX = int(os.getenv("FRAME_BUDGET_MAX", str(TIER_FRAME_BUDGET["max"])))
+
+print(f"Deployment tier: {DEPLOYMENT_TIER} (frame budget {FRAME_BUDGET_DEFAULT}, max {FRAME_BUDGET_MAX})")
+
+# Frame selection: "scene" keeps frames where the view changes, "uniform" samples at fixed spacing
+VIDEO_FRAME_SELECTION = os.getenv("VIDEO_FRAME_SELECTION", "scene")
+VIDEO_SCENE_PROBE_FPS = float(os.getenv("VIDEO_SCENE_PROBE_FPS", "2.0"))  # Frames per second checked for scene changes
+VIDEO_SCENE_CHANGE_THRESHOLD = float(os.getenv("VIDEO_SCENE_CHANGE_THRESHOLD", "0.3"))  # 0-1, higher keeps fewer frames
+VIDEO_SHARPNESS_CANDIDATES = int(os.getenv("VIDEO_SHARPNESS_CANDIDATES", "3"))  # Frames scored for blur per sampling window
+
+# Frames whose perceptual hashes differ by at most this many bits (of 64) are sent to the vision model once
+FRAME_DEDUP_HAMMING_THRESHOLD = int(os.getenv("FRAME_DEDUP_HAMMING_THRESHOLD", "6"))
+
+# Encoder stage for frames sent to the vision model
+VIDEO_FRAME_MAX_EDGE = int(os.getenv("VIDEO_FRAME_MAX_EDGE", "1280"))  # Max long edge in pixels
+VIDEO_JPEG_QUALITY = int(os.getenv("VIDEO_JPEG_QUALITY", "85"))
+VIDEO_JPEG_MIN_QUALITY = int(os.getenv("VIDEO_JPEG_MIN_QUALITY", "50"))
+VIDEO_FRAME_BYTE_BUDGET = int(os.getenv("VIDEO_FRAME_BYTE_BUDGET", str(250 * 1024)))  # 250KB per frame
+
+# Content-addressed store for frame and item images served by /api/sell/frames/{frame_id}
+FRAME_STORE_DIR = os.getenv("FRAME_STORE_DIR", str(Path(tempfile.gettempdir()) / "smartscape_frames"))
+FRAME_THUMBNAIL_EDGE = int(os.getenv("FRAME_THUMBNAIL_EDGE", "320"))  # Long edge of thumbnails in pixels
+
+# Videos are decoded in time segments, in parallel worker processes, so frames reach object detection early
+VIDEO_DECODE_SEGMENT_SECONDS = float(os.getenv("VIDEO_DECODE_SEGMENT_SECONDS", "15"))
+VIDEO_DECODE_WORKERS = int(os.getenv("VIDEO_DECODE_WORKERS", str(min(4, os.cpu_count() or 1))))  # Decode process pool size
+
+# Vision-model calls run concurrently; each job gets its own limit and all jobs share the global one
+VISION_JOB_CONCURRENCY = int(os.getenv("VISION_JOB_CONCURRENCY", "4"))  # In-flight detection requests per job
+VISION_GLOBAL_CONCURRENCY = int(os.getenv("VISION_GLOBAL_CONCURRENCY", "8"))  # In-flight detection requests across all jobs
+
+# "frame" sends one vision request per frame; "mosaic" packs VISION_MOSAIC_TILES frames into one numbered grid image per request
+VISION_DETECTION_MODE = os.getenv("VISION_DETECTION_MODE", "frame").lower()
+VISION_MOSAIC_TILES = max(4, min(9, int(os.getenv("VISION_MOSAIC_TILES", "4"))))  # Frames per grid image (4-9)
+VISION_MOSAIC_TILE_EDGE = int(os.getenv("VISION_MOSAIC_TILE_EDGE", "640"))  # Width of each tile in pixels
+
+# Vision-model results are cached per frame (perceptual hash + model + prompt version) so re-uploads skip repeat calls
+DETECTION_CACHE_ENABLED = os.getenv("DETECTION_CACHE_ENABLED", "true").lower() == "true"
+DETECTION_CACHE_PATH = os.getenv("DETECTION_CACHE_PATH", str(Path(tempfile.gettempdir()) / "smartscape_detection_cache.sqlite3"))
+DETECTION_CACHE_MAX_ENTRIES = int(os.getenv("DETECTION_CACHE_MAX_ENTRIES", "10000"))  # Least recently used entries are evicted past this
+DETECTION_CACHE_MIN_SHARPNESS = float(os.getenv("DETECTION_CACHE_MIN_SHARPNESS", "30"))  # Flatter frames (blank walls, dark shots) look alike across videos, so they skip the cache
+
+# Cross-frame item deduplication: detections of the same kind from the same view merge when their boxes overlap
+ITEM_DEDUP_IOU_THRESHOLD = float(os.getenv("ITEM_DEDUP_IOU_THRESHOLD", "0.3"))
+ITEM_DEDUP_VIEW_HAMMING = int(os.getenv("ITEM_DEDUP_VIEW_HAMMING", "16"))  # Max frame-hash distance (of 64 bits) for boxes to be comparable
+ITEM_DEDUP_WINDOW_SECONDS = float(os.getenv("ITEM_DEDUP_WINDOW_SECONDS", "4"))  # Same-view window for frames without a hash, and the longest gap an item is matched across by name alone
+
+# Item photos are padded crops of each detected bounding box rather than the whole frame
+ITEM_CROP_PADDING = float(os.getenv("ITEM_CROP_PADDING", "0.15"))  # Extra margin per side, as a fraction of the box size
+ITEM_CROP_MIN_EDGE = int(os.getenv("ITEM_CROP_MIN_EDGE", "160"))  # Smallest crop side in pixels
+ITEM_CROP_MAX_EDGE = int(os.getenv("ITEM_CROP_MAX_EDGE", "1024"))  # Long edge of listing photos in pixels
+
+# Seconds between keep-alive comments on idle /api/sell/extraction-events streams
+JOB_EVENTS_HEARTBEAT_SECONDS = float(os.getenv("JOB_EVENTS_HEARTBEAT_SECONDS", "15"))
+JOB_EVENTS_POLL_SECONDS = float(os.getenv("JOB_EVENTS_POLL_SECONDS", "1"))  # How often streams re-check the job store for changes made by other workers
+
+# Extraction jobs, frames and items are kept in SQLite so they survive restarts and are shared by every worker
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", str(Path(tempfile.gettempdir()) / "smartscape_jobs.sqlite3"))
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "168"))  # Jobs older than this are purged
+JOB_PURGE_INTERVAL_HOURS = float(os.getenv("JOB_PURGE_INTERVAL_HOURS", "1"))  # How often the lease sweep also purges old jobs
+
+# Video extraction runs on a fixed pool of workers fed by a bounded, per-user round-robin queue
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))  # Videos processed at once per server process
+EXTRACTION_QUEUE_MAX_DEPTH = int(os.getenv("EXTRACTION_QUEUE_MAX_DEPTH", "20"))  # Waiting videos before uploads get 429
+EXTRACTION_JOB_SECONDS_ESTIMATE = float(os.getenv("EXTRACTION_JOB_SECONDS_ESTIMATE", "60"))  # Seeds Retry-After until real durations are measured
+
+# A worker running an extraction job holds a lease on it; jobs whose lease lapses (crash, deploy) are queued again by a lease sweep
+EXTRACTION_LEASE_SECONDS = float(os.getenv("EXTRACTION_LEASE_SECONDS", "60"))
+
+# In-process state maps (negotiation and chat histories) expire idle entries and evict least recently used ones past these caps
+STATE_MAX_ENTRIES = int(os.getenv("STATE_MAX_ENTRIES", "1000"))  # Entries per map
+STATE_TTL_SECONDS = float(os.getenv("STATE_TTL_SECONDS", "86400"))  # Idle time before an entry expires
+STATE_MAX_BYTES = int(os.getenv("STATE_MAX_BYTES", str(16 * 1024 * 1024)))  # Estimated size per map
+STATE_SPILL_PATH = os.getenv("STATE_SPILL_PATH", str(Path(tempfile.gettempdir()) / "smartscape_state.sqlite3"))  # Evicted conversations are kept here
+STATE_SPILL_RETENTION_HOURS = float(os.getenv("STATE_SPILL_RETENTION_HOURS", "720"))
@@ -3,8 +3,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from routes.buy_mode import router as buy_router
 from routes.sell_mode import router as sell_router
+from services.bounded_state import state_metrics
 import config  # This will load the environment variables
-import uvicorn
+import os
+import sys
 
 app = FastAPI(title="SmartScape", description="AI-powered Home Decor", version="1.0.0")
 
@@ -29,5 +31,13 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics/state")
+async def get_state_metrics():
+    """Entry counts, estimated sizes and evictions of in-process state maps"""
+    return {"maps": state_metrics()}
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Video decode workers are spawned processes that re-import __main__; run the app through
+    # `python -m uvicorn` so they import uvicorn's entry point instead of this module and every route
+    os.execv(sys.executable, [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", os.path.dirname(os.path.abspath(__file__)),
+                              "--host", "0.0.0.0", "--port", "8000"])
\ No newline at end of file
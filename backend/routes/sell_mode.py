@@ -1,14 +1,24 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
-from services.video_processor import VideoProcessor
+from fastapi import APIRouter, File, UploadFile, HTTPException, Request
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
+from services.video_processor import VideoProcessor, shutdown_decode_pool
 from services.listing_generator import ListingGenerator
 from services.marketplace_automation import MarketplaceAutomation
 from services.negotiation_ai import NegotiationAI
 from services.usethis_automation import UseThisAutomation
 from services.appwrite_service import AppwriteService
+from services.video_spool import VideoSpool, UploadTooLargeError
+from services.frame_store import FrameStore
+from services.job_events import JobEventBus
+from services.job_store import JobStore
+from services.extraction_queue import ExtractionQueue, QueueFullError
 import asyncio
+import json
+import os
+import socket
+import time
 import uuid
-from typing import Dict, List
+import config
+from typing import Dict, List, Optional, Tuple
 
 router = APIRouter(prefix="/api/sell", tags=["sell_mode"])
 
@@ -19,20 +29,192 @@ marketplace_automation = MarketplaceAutomation()
 negotiation_ai = NegotiationAI()
 usethis_automation = UseThisAutomation()
 appwrite_service = AppwriteService()
+video_spool = VideoSpool()
+frame_store = FrameStore()
+job_events = JobEventBus()
 
-# Store for tracking extraction jobs
-extraction_jobs: Dict[str, Dict] = {}
+# Extraction jobs live in SQLite so they survive restarts and are shared by every worker
+job_store = JobStore(frame_store=frame_store)
+
+# Identifies this server process in job leases
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Fields extraction-status can be limited to with ?fields=
+STATUS_FIELDS = {"status", "stage", "progress", "queue_position", "filename", "frame_budget", "frames", "items",
+                 "removed_items", "since_version", "metadata", "metrics", "error"}
+
+async def queue_moved(job_ids: List[str]):
+    """Waiting jobs' places in line changed: bump their versions so pollers and streams see it"""
+    
+    def bump_versions():
+        for job_id in job_ids:
+            job_store.bump_version(job_id)
+    
+    await asyncio.to_thread(bump_versions)
+    for job_id in job_ids:
+        job_events.publish(job_id)
+
+# Extractions run on a bounded worker pool instead of the request event loop's background tasks
+extraction_queue = ExtractionQueue(on_position_change=queue_moved)
+
+# Long-running tasks started with the app, cancelled when it shuts down
+background_tasks: List[asyncio.Task] = []
+
+def queue_full_error(retry_after: int) -> HTTPException:
+    """429 telling the client when the extraction queue is likely to have room"""
+    
+    return HTTPException(
+        status_code=429,
+        detail="Too many videos are being processed. Please try again shortly.",
+        headers={"Retry-After": str(retry_after)}
+    )
+
+def serialize_record(record: Dict) -> Dict:
+    """JSON-safe copy of a frame or item: image bytes are replaced by frame store URLs"""
+    
+    public_record = {key: value for key, value in record.items() if key not in ('frame_data', 'source_frame_data')}
+    if record.get('image_id'):
+        public_record['frame_url'] = frame_store.url(record['image_id'])
+        public_record['thumbnail_url'] = frame_store.url(record['image_id'], "thumb")
+    if record.get('source_image_id'):
+        public_record['source_frame_url'] = frame_store.url(record['source_image_id'])
+    return public_record
+
+async def get_job_or_404(job_id: str, **options) -> Dict:
+    """Load a job from the job store, or fail the request with 404"""
+    
+    job = await asyncio.to_thread(job_store.get_job, job_id, **options)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+def get_item_or_404(job: Dict, item_id: str) -> Dict:
+    """Find a job's item by ID, or fail the request with 404"""
+    
+    for item in job["items"]:
+        if item.get("id") == item_id:
+            return item
+    raise HTTPException(status_code=404, detail="Item not found")
+
+async def update_job(job_id: str, **changes):
+    """Set job fields, bumping the job version and waking its event streams if anything changed"""
+    
+    if await asyncio.to_thread(job_store.update_job, job_id, **changes) is not None:
+        job_events.publish(job_id)
+
+async def touch_item(job_id: str, item: Dict):
+    """Save an item changed in place at a new job version"""
+    
+    await asyncio.to_thread(job_store.save_item, job_id, item)
+    job_events.publish(job_id)
+
+async def remove_item(job_id: str, item_id: str) -> bool:
+    """Delete an item, leaving a tombstone so clients syncing by version learn it is gone"""
+    
+    if await asyncio.to_thread(job_store.delete_item, job_id, item_id) is None:
+        return False
+    job_events.publish(job_id)
+    return True
+
+async def publish_items(job_id: str, items: List[Dict]):
+    """Replace a job's items; new and changed items get a new version, unchanged ones keep theirs"""
+    
+    if await asyncio.to_thread(job_store.publish_items, job_id, items) is not None:
+        job_events.publish(job_id)
+
+def job_delta(job: Dict, since_version: int = 0) -> Dict:
+    """Everything about a job loaded with ``since_version`` that changed after it; version 0 gives the full job"""
+    
+    return {
+        "job_id": job["job_id"],
+        "version": job["version"],
+        "since_version": since_version,
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": job["progress"],
+        "queue_position": extraction_queue.position(job["job_id"]),
+        "error": job["error"],
+        "frames": [serialize_record(frame) for frame in job["frames"]],
+        "items": [serialize_record(item) for item in job["items"]],
+        "removed_items": list(job["removed_items"])
+    }
+
+@router.on_event("startup")
+async def purge_old_jobs():
+    """Drop extraction jobs past the retention period; also run every JOB_PURGE_INTERVAL_HOURS by the lease sweep"""
+    for job_id in await asyncio.to_thread(job_store.purge_jobs, config.JOB_RETENTION_HOURS * 3600):
+        await asyncio.to_thread(video_spool.cleanup, job_id)
+
+@router.on_event("startup")
+async def resume_unfinished_jobs():
+    """Start the lease sweep, which also queues jobs interrupted by a crash or deploy"""
+    background_tasks.append(asyncio.create_task(sweep_job_leases()))
+
+async def sweep_job_leases():
+    """Every third of a lease period, renew the leases of jobs waiting in this worker's queue and
+    queue unfinished jobs no worker holds a lease on.
+    
+    Jobs interrupted by a crash or deploy are picked up as soon as the dead
+    worker's lease expires, at startup or later, and resume from their last
+    checkpoint. Every JOB_PURGE_INTERVAL_HOURS it also purges jobs past the
+    retention period, so long-running servers don't only purge at startup.
+    """
+    
+    interval = config.EXTRACTION_LEASE_SECONDS / 3
+    purge_every = max(1, round(config.JOB_PURGE_INTERVAL_HOURS * 3600 / interval))
+    sweeps = 0
+    
+    while True:
+        sweeps += 1
+        if sweeps % purge_every == 0:
+            try:
+                await purge_old_jobs()
+            except Exception as e:
+                print(f"Error purging old extraction jobs: {str(e)}")
+        
+        try:
+            for job_id in extraction_queue.waiting_jobs():
+                await asyncio.to_thread(job_store.claim_job, job_id, WORKER_ID, config.EXTRACTION_LEASE_SECONDS)
+            
+            for job in await asyncio.to_thread(job_store.list_unfinished_jobs):
+                # The lease keeps other workers' sweeps from queueing the job too
+                if extraction_queue.has_job(job["job_id"]) or not await asyncio.to_thread(
+                        job_store.claim_job, job["job_id"], WORKER_ID, config.EXTRACTION_LEASE_SECONDS):
+                    continue
+                try:
+                    extraction_queue.submit(job["job_id"], job["user_id"], lambda job_id=job["job_id"]: process_video_extraction(job_id))
+                except QueueFullError:
+                    await asyncio.to_thread(job_store.release_job, job["job_id"], WORKER_ID)
+                    print("Extraction queue is full, remaining unfinished jobs wait for the next lease sweep")
+                    break
+                print(f"Resuming extraction job {job['job_id']}")
+        except Exception as e:
+            print(f"Error sweeping extraction job leases: {str(e)}")
+        
+        await asyncio.sleep(interval)
+
+@router.on_event("shutdown")
+async def stop_extraction_workers():
+    """Stop the lease sweep, extraction workers and video decode worker processes with the app"""
+    for task in background_tasks:
+        task.cancel()
+    await extraction_queue.stop()
+    shutdown_decode_pool()
 
 @router.post("/upload-video")
-async def upload_video(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
-    """Upload video and start object extraction process"""
+async def upload_video(file: UploadFile = File(...), frame_budget: Optional[int] = None, user_id: str = "default_user"):
+    """Upload video and queue the object extraction process.
+    
+    Answers 429 with Retry-After when the extraction queue is full and the
+    video isn't one the user already has a job for.
+    """
     
     # Validate file type
     if not file.content_type.startswith('video/'):
         raise HTTPException(status_code=400, detail="File must be a video")
     
     # Check file size (100MB limit)
-    if file.size > 100 * 1024 * 1024:
+    if file.size is not None and file.size > video_spool.max_bytes:
         raise HTTPException(status_code=400, detail="File size must be less than 100MB")
     
     try:
@@ -41,49 +223,283 @@ async def upload_video(background_tasks: BackgroundTasks, file: UploadFile = Fil
         # Generate job ID
         job_id = str(uuid.uuid4())
         
+        # Stream video to the job's spool file instead of holding it in memory
+        video_path, content_hash = await video_spool.save_upload(file, job_id)
+        
+        # Number of frames sent to the vision model, spread across the whole video
+        job_frame_budget = video_processor.resolve_frame_budget(frame_budget)
+        
+        # A retried upload of the same file by the same user gets the existing job, finished or still running
+        fingerprint = f"{content_hash}:{job_frame_budget}"
+        existing_job_id = await asyncio.to_thread(job_store.find_job_by_fingerprint, fingerprint, user_id)
+        if existing_job_id:
+            video_spool.cleanup(job_id)
+            existing_job = await get_job_or_404(existing_job_id)
+            print(f"Upload {file.filename} matches job {existing_job_id}, skipping extraction")
+            
+            return JSONResponse(content={
+                "success": True,
+                "job_id": existing_job_id,
+                "duplicate": True,
+                "status": existing_job["status"],
+                "items": [serialize_record(item) for item in existing_job["items"]],
+                "message": "This video was already uploaded. Returning the existing extraction job."
+            })
+        
+        # Only new jobs need room in the queue; re-uploads above are answered even when it is full
+        if extraction_queue.is_full():
+            video_spool.cleanup(job_id)
+            raise queue_full_error(extraction_queue.retry_after())
+        
         # Initialize job status
-        extraction_jobs[job_id] = {
-            "status": "processing",
-            "progress": 0,
-            "filename": file.filename,
-            "items": [],
-            "error": None
-        }
+        def create_job():
+            job_store.create_job(job_id, user_id, file.filename, job_frame_budget, fingerprint)
+            job_store.update_job(job_id, stage="queued")
+            # Leased while it waits too, so other workers' lease sweeps leave it alone
+            job_store.claim_job(job_id, WORKER_ID, config.EXTRACTION_LEASE_SECONDS)
         
-        # Read video data
-        video_data = await file.read()
+        await asyncio.to_thread(create_job)
         
-        # Start background processing
-        background_tasks.add_task(process_video_extraction, job_id, video_data, file.filename)
+        # Queue background processing
+        try:
+            queue_position = extraction_queue.submit(
+                job_id, user_id, lambda: process_video_extraction(job_id)
+            )
+        except QueueFullError as e:
+            await asyncio.to_thread(job_store.delete_job, job_id)
+            video_spool.cleanup(job_id)
+            raise queue_full_error(e.retry_after)
         
         return JSONResponse(content={
             "success": True,
             "job_id": job_id,
-            "message": "Video upload started. Use the job ID to check extraction status."
+            "queue_position": queue_position,
+            "message": "Video upload queued. Use the job ID to check extraction status."
         })
         
+    except HTTPException:
+        raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error in upload_video: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing video: {str(e)}")
 
 @router.get("/extraction-status/{job_id}")
-async def get_extraction_status(job_id: str):
-    """Check the status of video extraction job"""
+async def get_extraction_status(job_id: str, request: Request, since_version: Optional[int] = None, fields: Optional[str] = None):
+    """Check the status of video extraction job.
+    
+    With ``since_version`` only frames and items changed after that job
+    version are returned, plus the IDs of items removed since; ``fields``
+    (comma-separated, e.g. "status,progress") limits the response to those
+    fields. Answers 304 when the job hasn't changed since ``since_version``
+    or the If-None-Match ETag.
+    """
+    
+    version = await asyncio.to_thread(job_store.get_version, job_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    selected_fields = None
+    if fields:
+        selected_fields = sorted({field.strip() for field in fields.split(",") if field.strip()})
+        unknown_fields = set(selected_fields) - STATUS_FIELDS
+        if unknown_fields:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown_fields))}")
+    
+    # The ETag covers the job version and the projection, since both shape the body
+    etag = f'"{job_id}-{version}' + (f'-{",".join(selected_fields)}"' if selected_fields else '"')
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+    if (since_version is not None and since_version >= version) or request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
     
-    if job_id not in extraction_jobs:
+    job = await get_job_or_404(job_id, since_version=since_version or 0)
+    content = {
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": job["progress"],
+        "queue_position": extraction_queue.position(job_id),
+        "filename": job["filename"],
+        "frame_budget": job["frame_budget"],
+        "frames": [serialize_record(frame) for frame in job["frames"]],  # Return frames for manual review
+        "items": [serialize_record(item) for item in job["items"]],
+        "metadata": job["metadata"],
+        "metrics": job["metrics"],
+        "error": job["error"]
+    }
+    if since_version is not None:
+        content["since_version"] = since_version
+        content["removed_items"] = list(job["removed_items"])
+    if selected_fields:
+        content = {field: value for field, value in content.items() if field in selected_fields}
+    
+    return JSONResponse(content={
+        "success": True,
+        "job_id": job_id,
+        "version": job["version"],
+        **content
+    }, headers=headers)
+
+@router.get("/extraction-events/{job_id}")
+async def stream_extraction_events(job_id: str, request: Request, last_event_id: Optional[int] = None):
+    """Stream job changes as Server-Sent Events.
+    
+    Each event's id is the job version and its data holds only what changed
+    since the previous event. A reconnecting client sends Last-Event-ID (or
+    ?last_event_id= on the first connection) and resumes from that version.
+    The stream ends with an "end" event once the job completes or fails.
+    
+    Changes made in this process wake the stream at once; the job store is
+    also re-checked every JOB_EVENTS_POLL_SECONDS to pick up changes made
+    by other workers.
+    """
+    
+    if await asyncio.to_thread(job_store.get_version, job_id) is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = extraction_jobs[job_id]
+    header_event_id = request.headers.get("last-event-id", "")
+    since_version = int(header_event_id) if header_event_id.isdigit() else (last_event_id or 0)
+    
+    async def event_stream():
+        nonlocal since_version
+        changed = job_events.subscribe(job_id)
+        try:
+            yield "retry: 2000\n\n"
+            last_sent = time.monotonic()
+            while True:
+                state = await asyncio.to_thread(job_store.get_state, job_id)
+                if state is None:
+                    yield "event: end\ndata: {\"status\": \"deleted\"}\n\n"
+                    return
+                
+                version, status = state
+                if version > since_version:
+                    job = await asyncio.to_thread(job_store.get_job, job_id, since_version=since_version)
+                    if job is None:
+                        continue  # Deleted since; the next pass ends the stream
+                    delta = job_delta(job, since_version)
+                    since_version, status = delta["version"], delta["status"]
+                    last_sent = time.monotonic()
+                    yield f"id: {since_version}\nevent: job\ndata: {json.dumps(delta)}\n\n"
+                
+                # Checked on every pass, so a client reconnecting to a finished job is told so at once
+                if status in ("completed", "failed"):
+                    yield f"event: end\ndata: {json.dumps({'status': status})}\n\n"
+                    return
+                
+                if not await job_events.wait(changed, config.JOB_EVENTS_POLL_SECONDS):
+                    if await request.is_disconnected():
+                        return
+                    # Comment lines keep proxies from closing an idle stream
+                    if time.monotonic() - last_sent >= config.JOB_EVENTS_HEARTBEAT_SECONDS:
+                        last_sent = time.monotonic()
+                        yield ": keep-alive\n\n"
+        finally:
+            job_events.unsubscribe(job_id, changed)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@router.get("/frames/{frame_id}")
+async def get_frame(frame_id: str, request: Request, variant: str = "full"):
+    """Serve a stored frame or item image, full size or as a thumbnail"""
+    
+    if variant not in ("full", "thumb"):
+        raise HTTPException(status_code=400, detail="variant must be 'full' or 'thumb'")
+    
+    # Thumbnails are generated on first request, which is OpenCV work
+    path = await asyncio.to_thread(frame_store.image_path, frame_id, variant)
+    if not path:
+        raise HTTPException(status_code=404, detail="Frame not found")
+    
+    # Frame IDs are content hashes, so a given URL never changes
+    etag = f'"{frame_id}-{variant}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable"
+    }
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
+
+@router.get("/detection-cache")
+async def get_detection_cache_stats():
+    """Get detection cache size and hit/miss counters"""
+    
+    if not video_processor.detection_cache:
+        return JSONResponse(content={"enabled": False})
+    
+    return JSONResponse(content={"enabled": True, **video_processor.detection_cache.stats()})
+
+@router.get("/extraction-queue")
+async def get_extraction_queue_stats():
+    """Get extraction worker pool and queue depth"""
+    
+    return JSONResponse(content=extraction_queue.stats())
+
+@router.delete("/jobs/{job_id}")
+async def delete_extraction_job(job_id: str):
+    """Cancel an extraction job and delete everything stored for it.
+    
+    A waiting job leaves the queue; a running one is cancelled, which aborts
+    its in-flight vision requests and stops waiting on uploads. Appwrite
+    calls run in threads and can't be aborted, so an upload already under
+    way still finishes. The spooled video and any frame images no other job
+    uses are removed.
+    """
+    
+    await get_job_or_404(job_id)
+    cancelled = await extraction_queue.cancel(job_id)
+    await asyncio.to_thread(job_store.delete_job, job_id)
+    video_spool.cleanup(job_id)
+    # Event streams see the job gone and end with a "deleted" event
+    job_events.publish(job_id)
     
     return JSONResponse(content={
         "success": True,
         "job_id": job_id,
-        "status": job["status"],
-        "progress": job["progress"],
-        "filename": job["filename"],
-        "frames": job.get("frames", []),  # Return frames for manual review
-        "items": job["items"],
-        "error": job.get("error")
+        "cancelled": cancelled,
+        "message": "Extraction job deleted"
+    })
+
+@router.post("/jobs/{job_id}/retry")
+async def retry_job(job_id: str):
+    """Re-run a failed extraction job from the stage that failed.
+    
+    Stages that completed before the failure are not repeated.
+    """
+    
+    job = await get_job_or_404(job_id)
+    if job["status"] != "failed":
+        raise HTTPException(status_code=409, detail=f"Only failed jobs can be retried, this one is {job['status']}")
+    
+    checkpoints = await asyncio.to_thread(job_store.get_checkpoints, job_id)
+    if "decode" not in checkpoints and not video_spool.find_video(job_id):
+        raise HTTPException(status_code=409, detail="The uploaded video is no longer available, please upload it again")
+    
+    if not await asyncio.to_thread(job_store.claim_job, job_id, WORKER_ID, config.EXTRACTION_LEASE_SECONDS):
+        raise HTTPException(status_code=409, detail="This job is already being retried")
+    
+    # Mark the job as processing first, so the worker can't pick it up while it still looks failed
+    await update_job(job_id, status="processing", error=None)
+    try:
+        queue_position = extraction_queue.submit(job_id, job["user_id"], lambda: process_video_extraction(job_id))
+    except QueueFullError as e:
+        await update_job(job_id, status="failed", error=job["error"])
+        await asyncio.to_thread(job_store.release_job, job_id, WORKER_ID)
+        raise queue_full_error(e.retry_after)
+    
+    return JSONResponse(content={
+        "success": True,
+        "job_id": job_id,
+        "stage": job["stage"],
+        "queue_position": queue_position,
+        "message": f"Retrying extraction from the {job['stage']} stage"
     })
 
 @router.post("/generate-listings")
@@ -94,10 +510,7 @@ async def generate_listings(request_data: dict):
     if not job_id:
         raise HTTPException(status_code=400, detail="job_id is required")
     
-    if job_id not in extraction_jobs:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    job = extraction_jobs[job_id]
+    job = await get_job_or_404(job_id, with_images=True)
     
     if job["status"] != "completed":
         raise HTTPException(status_code=400, detail="Extraction not completed yet")
@@ -144,14 +557,11 @@ async def handle_negotiation(listing_id: str, buyer_message: str, current_price:
 async def add_manual_item(job_id: str, frame_id: str, item_name: str, category: str, price: float, condition: str = "good"):
     """Add a manually identified item to a frame"""
     
-    if job_id not in extraction_jobs:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    job = extraction_jobs[job_id]
+    await get_job_or_404(job_id)
     
     # Create manual item
     manual_item = {
-        'id': f"manual_item_{len(job['items'])}",
+        'id': f"manual_item_{uuid.uuid4().hex[:12]}",
         'name': item_name,
         'category': category,
         'frame_id': frame_id,
@@ -162,7 +572,7 @@ async def add_manual_item(job_id: str, frame_id: str, item_name: str, category:
     }
     
     # Add to job items
-    job['items'].append(manual_item)
+    await touch_item(job_id, manual_item)
     
     return JSONResponse(content={
         "success": True,
@@ -174,7 +584,6 @@ async def add_manual_item(job_id: str, frame_id: str, item_name: str, category:
 async def get_category_suggestions():
     """Get category suggestions for manual item entry"""
     
-    video_processor = VideoProcessor()
     suggestions = video_processor.get_category_suggestions()
     
     return JSONResponse(content={
@@ -187,33 +596,28 @@ async def update_item(request_data: dict):
     """Update item name and/or price"""
     
     job_id = request_data.get("job_id")
-    item_index = request_data.get("item_index")
+    item_id = request_data.get("item_id")
     name = request_data.get("name")
     estimated_price = request_data.get("estimated_price")
     
     if not job_id:
         raise HTTPException(status_code=400, detail="job_id is required")
     
-    if item_index is None:
-        raise HTTPException(status_code=400, detail="item_index is required")
-    
-    if job_id not in extraction_jobs:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    job = extraction_jobs[job_id]
+    if not item_id:
+        raise HTTPException(status_code=400, detail="item_id is required")
     
-    if item_index >= len(job['items']) or item_index < 0:
-        raise HTTPException(status_code=400, detail="Invalid item index")
+    item = get_item_or_404(await get_job_or_404(job_id), item_id)
     
     # Update the item
     if name is not None:
-        job['items'][item_index]['name'] = name
+        item['name'] = name
     if estimated_price is not None:
-        job['items'][item_index]['estimated_price'] = estimated_price
+        item['estimated_price'] = estimated_price
+    await touch_item(job_id, item)
     
     return JSONResponse(content={
         "success": True,
-        "item": job['items'][item_index],
+        "item": serialize_record(item),
         "message": "Item updated successfully"
     })
 
@@ -222,29 +626,24 @@ async def delete_item(request_data: dict):
     """Delete an item from the extracted items list"""
     
     job_id = request_data.get("job_id")
-    item_index = request_data.get("item_index")
+    item_id = request_data.get("item_id")
     
     if not job_id:
         raise HTTPException(status_code=400, detail="job_id is required")
     
-    if item_index is None:
-        raise HTTPException(status_code=400, detail="item_index is required")
+    if not item_id:
+        raise HTTPException(status_code=400, detail="item_id is required")
     
-    if job_id not in extraction_jobs:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    job = extraction_jobs[job_id]
-    
-    if item_index >= len(job['items']) or item_index < 0:
-        raise HTTPException(status_code=400, detail="Invalid item index")
+    job = await get_job_or_404(job_id)
+    deleted_item = get_item_or_404(job, item_id)
     
     # Remove the item
-    deleted_item = job['items'].pop(item_index)
+    await remove_item(job_id, item_id)
     
     return JSONResponse(content={
         "success": True,
-        "deleted_item": deleted_item,
-        "remaining_items": len(job['items']),
+        "deleted_item": serialize_record(deleted_item),
+        "remaining_items": len(job['items']) - 1,
         "message": "Item deleted successfully"
     })
 
@@ -372,10 +771,7 @@ async def post_to_usethis(request_data: dict):
     if not job_id:
         raise HTTPException(status_code=400, detail="job_id is required")
     
-    if job_id not in extraction_jobs:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    job = extraction_jobs[job_id]
+    job = await get_job_or_404(job_id, with_images=True)
     
     if job["status"] != "completed":
         raise HTTPException(status_code=400, detail="Extraction not completed yet")
@@ -457,10 +853,7 @@ async def create_storefront(request_data: dict):
     if not email:
         raise HTTPException(status_code=400, detail="UseThis email is required")
     
-    if job_id not in extraction_jobs:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    job = extraction_jobs[job_id]
+    job = await get_job_or_404(job_id, with_images=True)
     
     if job["status"] != "completed":
         raise HTTPException(status_code=400, detail="Extraction not completed yet")
@@ -563,10 +956,7 @@ async def post_to_ebay(request_data: dict):
     if not job_id:
         raise HTTPException(status_code=400, detail="job_id is required")
     
-    if job_id not in extraction_jobs:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    job = extraction_jobs[job_id]
+    job = await get_job_or_404(job_id, with_images=True)
     
     if job["status"] != "completed":
         raise HTTPException(status_code=400, detail="Extraction not completed yet")
@@ -653,68 +1043,248 @@ async def get_ebay_config():
         "auth_token_configured": bool(ebay_service.sandbox_auth_token)
     })
 
-async def process_video_extraction(job_id: str, video_data: bytes, filename: str):
-    """Background task to process video and extract sellable items using AI"""
+async def hold_job_lease(job_id: str, job_task: asyncio.Task):
+    """Keep renewing a running job's lease so no other worker resumes it.
+    
+    Also cancels the job within JOB_EVENTS_POLL_SECONDS if it is deleted,
+    including through another worker.
+    """
+    
+    renewed = time.monotonic()
+    while True:
+        await asyncio.sleep(config.JOB_EVENTS_POLL_SECONDS)
+        if await asyncio.to_thread(job_store.get_version, job_id) is None:
+            print(f"Job {job_id} was deleted, cancelling its extraction")
+            job_task.cancel()
+            return
+        if time.monotonic() - renewed >= config.EXTRACTION_LEASE_SECONDS / 3:
+            await asyncio.to_thread(job_store.claim_job, job_id, WORKER_ID, config.EXTRACTION_LEASE_SECONDS)
+            renewed = time.monotonic()
+
+async def process_video_extraction(job_id: str):
+    """Background task to process video and extract sellable items using AI.
+    
+    Runs the decode -> detect -> dedup -> persist stages. Each stage's output
+    is checkpointed in the job store and stages with a checkpoint are skipped,
+    so a resumed or retried job carries on from where it stopped without
+    repeating vision calls or Appwrite uploads.
+    """
+    
+    if not await asyncio.to_thread(job_store.claim_job, job_id, WORKER_ID, config.EXTRACTION_LEASE_SECONDS):
+        # If that worker died, the lease sweep queues the job again once its lease expires
+        print(f"Job {job_id} is already being run by another worker")
+        return
+    
+    job = await asyncio.to_thread(job_store.get_job, job_id)
+    if job is None or job["status"] != "processing":
+        # Finished by another worker while this one had it queued
+        await asyncio.to_thread(job_store.release_job, job_id, WORKER_ID)
+        return
+    
+    lease = asyncio.create_task(hold_job_lease(job_id, asyncio.current_task()))
+    checkpoints = await asyncio.to_thread(job_store.get_checkpoints, job_id)
     
     try:
-        # Update progress
-        extraction_jobs[job_id]["progress"] = 10
+        if "dedup" not in checkpoints:
+            if "detect" in checkpoints:
+                detected_objects = await load_detected_objects(job_id, checkpoints)
+            else:
+                detected_objects, failed_frames = await run_decode_and_detect(job, checkpoints)
+                # With failed frames the stage isn't done: a resumed or retried job sends them again
+                if not failed_frames:
+                    await asyncio.to_thread(job_store.save_checkpoint, job_id, "detect", {"objects": len(detected_objects)})
+            await run_dedup(job_id, detected_objects)
+            await asyncio.to_thread(job_store.save_checkpoint, job_id, "dedup", {})
         
-        # Extract frames from video
-        frames = await video_processor.extract_frames(video_data)
-        extraction_jobs[job_id]["progress"] = 30
-        extraction_jobs[job_id]["frames"] = frames
+        item_count = await run_persist(job_id, job["user_id"])
         
-        # Detect objects in frames using AI
-        detected_objects = await video_processor.detect_objects(frames)
-        extraction_jobs[job_id]["progress"] = 60
+        await update_job(job_id, stage="completed", progress=100, status="completed")
         
-        # Filter for sellable items
-        sellable_items = await video_processor.filter_sellable_items(detected_objects)
-        extraction_jobs[job_id]["progress"] = 80
+        print(f"Video extraction completed for job {job_id}: {item_count} items found and saved to Appwrite")
         
-        # Save items to Appwrite database
-        user_id = "default_user"  # You can get this from session/auth
+    except Exception as e:
+        failed_job = await asyncio.to_thread(job_store.get_job, job_id)
+        if failed_job is None:
+            print(f"Extraction job {job_id} was deleted while running")
+            return
         
-        for item in sellable_items:
-            try:
-                # Upload image to Appwrite
-                image_url = await appwrite_service.upload_image(
-                    image_data=item["frame_data"],
-                    user_id=user_id,
-                    image_type="item_frame",
-                    original_filename=f"{item['name']}_frame.jpg"
-                )
-                
-                # Save item to database
-                item_doc_id = await appwrite_service.save_extracted_item(
-                    item=item,
-                    user_id=user_id,
-                    image_url=image_url
-                )
-                
-                # Update item with database info
-                item["appwrite_doc_id"] = item_doc_id
-                item["image_url"] = image_url
-                
-                print(f"Saved item '{item['name']}' to Appwrite with image URL: {image_url}")
-                
-            except Exception as e:
-                print(f"Error saving item '{item['name']}' to Appwrite: {str(e)}")
-                # Continue with other items even if one fails
-                continue
+        # The job's stage is left at the one that failed, which is where a retry picks up.
+        # Failed jobs are skipped by fingerprint lookups, so the next upload of this file tries again
+        print(f"Error in video extraction for job {job_id} at the {failed_job['stage']} stage: {str(e)}")
+        await update_job(job_id, status="failed", error=str(e))
+    
+    finally:
+        lease.cancel()
+        await asyncio.to_thread(job_store.release_job, job_id, WORKER_ID)
+
+async def run_decode_and_detect(job: Dict, checkpoints: Dict) -> Tuple[List[Dict], int]:
+    """Decode and detect stages, run together so vision requests start while the video is still decoding.
+    
+    Frames already decoded and detections already made by an earlier run are
+    read back from the job store instead of being produced again. Returns the
+    detected objects and the number of frames whose vision request failed;
+    if every frame failed, the stage fails.
+    """
+    
+    job_id = job["job_id"]
+    await update_job(job_id, stage="detect" if "decode" in checkpoints else "decode", progress=10)
+    
+    pipeline_started = time.monotonic()
+    frames = []
+    metrics = {}
+    detection_counts = {"duplicates": 0, "completed": 0, "failed": 0}
+    detections_so_far = []
+    # Callbacks of concurrent vision requests take turns, so their job store writes land in order
+    report_lock = asyncio.Lock()
+    known_detections = {
+        name.split(":", 1)[1]: objects for name, objects in checkpoints.items() if name.startswith("detect:")
+    }
+    
+    async def frame_stream():
+        if "decode" in checkpoints:
+            for frame in (await asyncio.to_thread(job_store.get_job, job_id, with_images=True))["frames"]:
+                yield frame
+            return
         
-        # Store results
-        extraction_jobs[job_id]["items"] = sellable_items
-        extraction_jobs[job_id]["progress"] = 100
-        extraction_jobs[job_id]["status"] = "completed"
+        video_path = video_spool.find_video(job_id)
+        if not video_path:
+            raise Exception("The uploaded video is no longer available, please upload it again")
+        async for frame in video_processor.iter_frames(video_path, job["frame_budget"]):
+            yield frame
         
-        print(f"Video extraction completed for job {job_id}: {len(sellable_items)} items found and saved to Appwrite")
+        metadata = {"encoding": video_processor.summarize_encoding(frames)}
+        await asyncio.to_thread(job_store.save_checkpoint, job_id, "decode", {"frames": len(frames)})
+        await update_job(job_id, stage="detect", metadata=metadata)
+        # Later stages and retries work from the frames in the job store
+        video_spool.cleanup(job_id)
+    
+    async def on_frame(frame: Dict):
+        frames.append(frame)
+        if frame.get("duplicate_of"):
+            detection_counts["duplicates"] += 1
+        if frame.get("image_id"):
+            return  # Read back from the job store
         
-    except Exception as e:
-        print(f"Error in video extraction for job {job_id}: {str(e)}")
-        extraction_jobs[job_id]["status"] = "failed"
-        extraction_jobs[job_id]["error"] = str(e)
+        # Keep frame images in the frame store so job status only carries IDs and URLs
+        frame["image_id"] = await asyncio.to_thread(frame_store.put, frame["frame_data"])
+        async with report_lock:
+            await asyncio.to_thread(job_store.add_frame, job_id, frame)
+            job_events.publish(job_id)
+            if "time_to_first_frame" not in metrics:
+                metrics["time_to_first_frame"] = round(time.monotonic() - pipeline_started, 3)
+                await update_job(job_id, metrics=metrics)
+    
+    async def on_detections(frame: Dict, objects: List[Dict]):
+        async with report_lock:
+            await report_detections(frame, objects)
+    
+    async def report_detections(frame: Dict, objects: List[Dict]):
+        # Detection covers 10-80% of progress; until decoding finishes the frame budget
+        # is the best estimate of how many frames will need a vision request
+        detection_counts["completed"] += 1
+        kept_frames = len(frames) - detection_counts["duplicates"]
+        expected_frames = max(kept_frames, job["frame_budget"] - detection_counts["duplicates"], 1)
+        await update_job(job_id, progress=10 + int(70 * detection_counts["completed"] / expected_frames))
+        
+        # Failed requests aren't checkpointed, so a resumed job sends those frames again; the
+        # failed_frames metric also keeps fingerprint lookups from reusing the incomplete job
+        if frame.get("detection_error"):
+            detection_counts["failed"] += 1
+            detection_counts["last_error"] = frame["detection_error"]
+            metrics["failed_frames"] = detection_counts["failed"]
+            await update_job(job_id, metrics=metrics)
+        elif frame["id"] not in known_detections:
+            await asyncio.to_thread(
+                job_store.save_checkpoint, job_id, f"detect:{frame['id']}",
+                [{key: value for key, value in obj.items() if key != "frame_data"} for obj in objects]
+            )
+        
+        # Publish partial items as soon as each frame's detections are in
+        if objects:
+            detections_so_far.extend(objects)
+            await publish_items(job_id, video_processor.merge_detections(detections_so_far))
+        
+        if objects and "time_to_first_item" not in metrics:
+            metrics["time_to_first_item"] = round(time.monotonic() - pipeline_started, 3)
+            await update_job(job_id, metrics=metrics)
+            print(f"First item for job {job_id} found after {metrics['time_to_first_item']}s")
+    
+    # Decode frames from the spooled video and detect objects in them as they arrive
+    detected_objects = await video_processor.detect_objects_streaming(
+        frame_stream(), on_frame, on_detections, known_detections=known_detections
+    )
+    metrics["detection_seconds"] = round(time.monotonic() - pipeline_started, 3)
+    await update_job(job_id, metrics=metrics, progress=80)
+    
+    if detection_counts["failed"] and detection_counts["failed"] == detection_counts["completed"]:
+        raise Exception(f"Object detection failed for all {detection_counts['failed']} frames: {detection_counts['last_error']}")
+    return detected_objects, detection_counts["failed"]
+
+async def load_detected_objects(job_id: str, checkpoints: Dict) -> List[Dict]:
+    """Detections checkpointed by the detect stage, with their frame images, in frame order"""
+    
+    detected_objects = []
+    for frame in (await asyncio.to_thread(job_store.get_job, job_id, with_images=True))["frames"]:
+        for obj in checkpoints.get(f"detect:{frame['id']}", []):
+            detected_objects.append({**obj, "frame_data": frame["frame_data"]})
+    return detected_objects
+
+async def run_dedup(job_id: str, detected_objects: List[Dict]):
+    """Dedup stage: merge detections into one item per physical object and crop its photo"""
+    
+    await update_job(job_id, stage="dedup", progress=80)
+    
+    # Filter for sellable items
+    sellable_items = await video_processor.filter_sellable_items(detected_objects)
+    
+    # Item photos are crops of the item, so every upload and listing prompt below moves far fewer bytes
+    await video_processor.crop_items(sellable_items)
+    for item in sellable_items:
+        if item.get('source_image_id'):
+            item["image_id"] = await asyncio.to_thread(frame_store.put, item["frame_data"])
+    await publish_items(job_id, sellable_items)
+
+async def run_persist(job_id: str, user_id: str) -> int:
+    """Persist stage: save items to Appwrite, skipping those an earlier run already saved; returns the item count"""
+    
+    await update_job(job_id, stage="persist")
+    sellable_items = (await asyncio.to_thread(job_store.get_job, job_id, with_images=True))["items"]
+    
+    for saved_count, item in enumerate(sellable_items, start=1):
+        # Saving covers the last 80-100% of progress
+        await update_job(job_id, progress=80 + int(20 * (saved_count - 1) / len(sellable_items)))
+        if item.get("appwrite_doc_id"):
+            continue
+        
+        try:
+            # Upload image to Appwrite
+            image_url = await appwrite_service.upload_image(
+                image_data=item["frame_data"],
+                user_id=user_id,
+                image_type="item_frame",
+                original_filename=f"{item['name']}_frame.jpg"
+            )
+            
+            # Save item to database
+            item_doc_id = await appwrite_service.save_extracted_item(
+                item=item,
+                user_id=user_id,
+                image_url=image_url
+            )
+            
+            # Update item with database info
+            item["appwrite_doc_id"] = item_doc_id
+            item["image_url"] = image_url
+            await touch_item(job_id, item)
+            
+            print(f"Saved item '{item['name']}' to Appwrite with image URL: {image_url}")
+            
+        except Exception as e:
+            print(f"Error saving item '{item['name']}' to Appwrite: {str(e)}")
+            # Continue with other items even if one fails
+            continue
+    
+    return len(sellable_items)
 
 async def generate_usethis_listing_with_ai(item: Dict) -> Dict:
     """Generate UseThis rental listing data using Nebius AI"""
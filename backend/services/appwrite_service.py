@@ -3,7 +3,8 @@ from appwrite.services.databases import Databases
 from appwrite.services.storage import Storage
 from appwrite.id import ID
 import config
-import base64
+from services.image_data import ImageData, image_bytes
+import asyncio
 import tempfile
 import os
 from typing import Dict, List
@@ -24,23 +25,24 @@ class AppwriteService:
         self.sell_items_collection_id = "sell_items"  # Sell mode extracted items
         self.bucket_id = "6860506f002eb0873e7c"  # User's storage bucket ID
     
-    async def upload_image(self, image_data: str, user_id: str, image_type: str, original_filename: str = None) -> str:
-        """Upload base64 image to Appwrite storage and save metadata to database"""
+    async def upload_image(self, image_data: ImageData, user_id: str, image_type: str, original_filename: str = None) -> str:
+        """Upload image (raw bytes or base64) to Appwrite storage and save metadata to database"""
         
         try:
-            # Convert base64 to file
-            image_bytes = base64.b64decode(image_data)
+            # Raw bytes are written as-is; base64 is only decoded if a client sent it
+            raw_image = image_bytes(image_data)
             
             # Create temporary file
             with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-                temp_file.write(image_bytes)
+                temp_file.write(raw_image)
                 temp_path = temp_file.name
             
             # Generate unique file ID
             file_id = ID.unique()
             
-            # Upload to Appwrite storage
-            file_result = self.storage.create_file(
+            # Upload to Appwrite storage; the SDK blocks, so it runs in a thread and a cancelled job stops waiting on it
+            file_result = await asyncio.to_thread(
+                self.storage.create_file,
                 bucket_id=self.bucket_id,
                 file_id=file_id,
                 file=open(temp_path, 'rb')
@@ -53,7 +55,8 @@ class AppwriteService:
             image_url = f"{config.APPWRITE_ENDPOINT}/storage/buckets/{self.bucket_id}/files/{file_id}/view?project={config.APPWRITE_PROJECT_ID}"
             
             # Save metadata to database
-            image_doc = self.databases.create_document(
+            image_doc = await asyncio.to_thread(
+                self.databases.create_document,
                 database_id=self.database_id,
                 collection_id=self.saved_items_collection_id,
                 document_id=ID.unique(),
@@ -73,16 +76,16 @@ class AppwriteService:
             print(f"Error uploading image to Appwrite: {str(e)}")
             raise Exception(f"Failed to upload image: {str(e)}")
     
-    async def upload_image_to_storage_only(self, image_data: str, filename: str = None) -> str:
-        """Upload base64 image to Appwrite storage only (no database)"""
+    async def upload_image_to_storage_only(self, image_data: ImageData, filename: str = None) -> str:
+        """Upload image (raw bytes or base64) to Appwrite storage only (no database)"""
         
         try:
-            # Convert base64 to file
-            image_bytes = base64.b64decode(image_data)
+            # Raw bytes are written as-is; base64 is only decoded if a client sent it
+            raw_image = image_bytes(image_data)
             
             # Create temporary file
             with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-                temp_file.write(image_bytes)
+                temp_file.write(raw_image)
                 temp_path = temp_file.name
             
             # Generate unique file ID
@@ -112,7 +115,8 @@ class AppwriteService:
         """Save extracted item to Appwrite database (sell mode)"""
         
         try:
-            item_doc = self.databases.create_document(
+            item_doc = await asyncio.to_thread(
+                self.databases.create_document,
                 database_id=self.database_id,
                 collection_id=self.sell_items_collection_id,  # Use separate collection for sell mode
                 document_id=ID.unique(),
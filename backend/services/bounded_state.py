@@ -0,0 +1,222 @@
+import json
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterator, List, MutableMapping, Optional
+import config
+
+# Every live map, so their sizes can be reported together (maps are unhashable, so these are plain weak refs)
+_state_maps: List[weakref.ref] = []
+
+def estimate_size(value: Any) -> int:
+    """Rough size of a value in bytes, from its JSON encoding"""
+
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+def state_metrics() -> List[Dict]:
+    """Size and eviction counters of every bounded state map, by name"""
+
+    _state_maps[:] = [ref for ref in _state_maps if ref() is not None]
+    return sorted((ref().stats() for ref in _state_maps), key=lambda stats: stats["name"])
+
+class BoundedStateMap(MutableMapping):
+    """Dict for in-process state that evicts entries instead of growing forever.
+
+    Entries expire ``ttl_seconds`` after they were last read or written, the
+    least recently used ones are evicted past ``max_entries``, and more are
+    evicted while the estimated size is over ``max_bytes``. ``on_evict`` is
+    called with (key, value, reason) for each evicted entry so it can be
+    spilled to persistent storage, and ``loader`` is asked for keys that
+    aren't in memory so spilled state comes back transparently.
+
+    Sizes are estimated when an entry is written; code that mutates a value
+    in place should assign it back so its size is re-estimated.
+    """
+
+    def __init__(self, name: str, max_entries: int = None, ttl_seconds: float = None, max_bytes: int = None,
+                 on_evict: Callable[[Hashable, Any, str], None] = None,
+                 loader: Callable[[Hashable], Optional[Any]] = None,
+                 size_of: Callable[[Any], int] = estimate_size):
+        self.name = name
+        self.max_entries = max_entries or config.STATE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or config.STATE_TTL_SECONDS
+        self.max_bytes = max_bytes or config.STATE_MAX_BYTES
+        self.on_evict = on_evict
+        self.loader = loader
+        self.size_of = size_of
+
+        # key -> (value, size, last_used), least recently used first
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = {"expired": 0, "max_entries": 0, "max_bytes": 0}
+
+        _state_maps.append(weakref.ref(self))
+
+    def __getitem__(self, key: Hashable) -> Any:
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries[key] = (entry[0], entry[1], time.monotonic())
+                self._entries.move_to_end(key)
+                return entry[0]
+
+            self.misses += 1
+            value = self.loader(key) if self.loader else None
+            if value is None:
+                raise KeyError(key)
+            self.loads += 1
+            self[key] = value
+            return value
+
+    def __setitem__(self, key: Hashable, value: Any):
+        size = self.size_of(value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            self._expire()
+            self._enforce_limits(keep=key)
+
+    def __delitem__(self, key: Hashable):
+        with self._lock:
+            _, size, _ = self._entries.pop(key)
+            self._bytes -= size
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[Hashable]:
+        with self._lock:
+            self._expire()
+            return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire()
+            return len(self._entries)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._expire()
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "evictions": dict(self.evictions)
+            }
+
+    def _expire(self):
+        # Entries are kept in last-used order, so expired ones are all at the front
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._entries:
+            key, (_, _, last_used) = next(iter(self._entries.items()))
+            if last_used > cutoff:
+                break
+            self._evict(key, "expired")
+
+    def _enforce_limits(self, keep: Hashable):
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)), "max_entries")
+        # The entry just written stays even if it alone is over the byte budget
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            self._evict(key, "max_bytes")
+
+    def _evict(self, key: Hashable, reason: str):
+        value, size, _ = self._entries.pop(key)
+        self._bytes -= size
+        self.evictions[reason] += 1
+        if self.on_evict:
+            try:
+                self.on_evict(key, value, reason)
+            except Exception as e:
+                print(f"Error spilling evicted {self.name} entry {key}: {str(e)}")
+
+class StateSpill:
+    """SQLite table that evicted state is spilled to and loaded back from.
+
+    Pass ``save`` as a BoundedStateMap's ``on_evict`` and ``load`` as its
+    ``loader``. Values must be JSON-serializable; each map uses its own
+    ``namespace`` in the shared database.
+    """
+
+    def __init__(self, namespace: str, path: str = None):
+        self.namespace = namespace
+        self.path = Path(path or config.STATE_SPILL_PATH)
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS spilled_state (
+                namespace TEXT NOT NULL,
+                state_key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                spilled_at REAL NOT NULL,
+                PRIMARY KEY (namespace, state_key)
+            )
+        """)
+        self._db.commit()
+
+    def save(self, key: Hashable, value: Any, reason: str = None):
+        """Write an evicted entry"""
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO spilled_state (namespace, state_key, value, spilled_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, str(key), json.dumps(value), time.time())
+            )
+            self._db.commit()
+
+    def load(self, key: Hashable) -> Optional[Any]:
+        """Take a spilled entry back out, or None if there is none"""
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM spilled_state WHERE namespace = ? AND state_key = ?", (self.namespace, str(key))
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "DELETE FROM spilled_state WHERE namespace = ? AND state_key = ?", (self.namespace, str(key))
+            )
+            self._db.commit()
+        return json.loads(row[0])
+
+    def purge(self, max_age_seconds: float) -> int:
+        """Drop entries spilled more than ``max_age_seconds`` ago"""
+
+        with self._lock:
+            deleted = self._db.execute(
+                "DELETE FROM spilled_state WHERE namespace = ? AND spilled_at < ?",
+                (self.namespace, time.time() - max_age_seconds)
+            ).rowcount
+            self._db.commit()
+        return deleted
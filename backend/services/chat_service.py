@@ -3,13 +3,14 @@ from typing import Dict, List, Any
 import config
 from services.mem0_service import Mem0Service
 from services.product_search import ProductSearchService
+from services.bounded_state import BoundedStateMap
 from openai import OpenAI
 
 class ChatService:
     """Service for handling intelligent chat interactions with Mem0 and Tavily"""
     
     def __init__(self):
-        self.conversation_history = {}
+        self.conversation_history = BoundedStateMap("chat_conversations")
         
         # Initialize Nebius AI client
         self.ai_client = OpenAI(
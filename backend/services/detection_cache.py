@@ -0,0 +1,144 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import config
+
+class DetectionCache:
+    """Persistent cache of vision-model item arrays per frame.
+
+    Entries are keyed by a frame's perceptual hash, the model name, a
+    version hash of the detection prompt and the detection mode that
+    produced them, so a re-uploaded or re-trimmed video reuses earlier
+    detections for frames that look the same. The
+    least recently used entries are evicted once the cache holds more than
+    ``max_entries``, a tenth of the cap at a time so a full cache doesn't
+    delete on every store. Calls block on SQLite, so async code runs them
+    in a thread.
+    """
+
+    # Hits whose last-used times are buffered before being written back in one commit
+    TOUCH_BATCH = 64
+
+    def __init__(self, path: str = None, max_entries: int = None):
+        self.path = Path(path or config.DETECTION_CACHE_PATH)
+        self.max_entries = max_entries or config.DETECTION_CACHE_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS detections (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                items TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS detections_last_used ON detections (last_used)")
+        self._db.commit()
+
+        # Kept up to date by put/purge_stale rather than counted on every store
+        self._entries = self._db.execute("SELECT COUNT(*) FROM detections").fetchone()[0]
+        self._touched: Dict[str, float] = {}
+
+    def get(self, frame_hash: str, model: str, prompt_version: str,
+            detection_modes: Sequence[str] = ("frame",)) -> Optional[List[Dict]]:
+        """Cached items for a frame from the first of ``detection_modes`` that has them, or None on a miss"""
+
+        keys = [self._key(frame_hash, model, prompt_version, mode) for mode in detection_modes]
+        with self._lock:
+            rows = dict(self._db.execute(
+                f"SELECT cache_key, items FROM detections WHERE cache_key IN ({', '.join('?' * len(keys))})", keys
+            ).fetchall())
+            key = next((key for key in keys if key in rows), None)
+            if key is None:
+                self.misses += 1
+                return None
+
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.TOUCH_BATCH:
+                self._flush_touched()
+                self._db.commit()
+            self.hits += 1
+        return json.loads(rows[key])
+
+    def put(self, frame_hash: str, model: str, prompt_version: str, detection_mode: str, items: List[Dict]):
+        """Store the items the model found in a frame, evicting old entries over the size cap"""
+
+        now = time.time()
+        key = self._key(frame_hash, model, prompt_version, detection_mode)
+        with self._lock:
+            updated = self._db.execute(
+                "UPDATE detections SET items = ?, created_at = ?, last_used = ? WHERE cache_key = ?",
+                (json.dumps(items), now, now, key)
+            ).rowcount
+            if not updated:
+                self._db.execute(
+                    "INSERT INTO detections (cache_key, model, prompt_version, items, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, prompt_version, json.dumps(items), now, now)
+                )
+                self._entries += 1
+
+            if self._entries > self.max_entries:
+                # Evict down to 90% of the cap, so the next few stores don't have to
+                self._flush_touched()
+                evict = self._entries - self.max_entries + max(1, self.max_entries // 10)
+                evicted = self._db.execute(
+                    "DELETE FROM detections WHERE cache_key IN "
+                    "(SELECT cache_key FROM detections ORDER BY last_used LIMIT ?)", (evict,)
+                ).rowcount
+                self._entries -= evicted
+                self.evictions += evicted
+            self._db.commit()
+
+    def purge_stale(self, model: str, prompt_version: str) -> int:
+        """Delete a model's entries made with any other prompt version"""
+
+        with self._lock:
+            deleted = self._db.execute(
+                "DELETE FROM detections WHERE model = ? AND prompt_version != ?", (model, prompt_version)
+            ).rowcount
+            self._entries -= deleted
+            self._db.commit()
+
+        if deleted:
+            print(f"Purged {deleted} cached detections from an older detection prompt")
+        return deleted
+
+    def stats(self) -> Dict:
+        """Hit/miss counters since startup and the current number of entries"""
+
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+            "evictions": self.evictions
+        }
+
+    def _flush_touched(self):
+        """Write buffered last-used times; the caller holds the lock and commits"""
+
+        if self._touched:
+            self._db.executemany(
+                "UPDATE detections SET last_used = ? WHERE cache_key = ?",
+                [(last_used, key) for key, last_used in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _key(self, frame_hash: str, model: str, prompt_version: str, detection_mode: str) -> str:
+        return hashlib.sha256(f"{model}\n{prompt_version}\n{detection_mode}\n{frame_hash}".encode()).hexdigest()
@@ -1,11 +1,10 @@
 import requests
 import base64
 import json
-import tempfile
-import os
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 import config
+from services.image_data import ImageData, image_bytes
 
 class EbayService:
     """Service for eBay API integration - listing creation and management"""
@@ -61,20 +60,15 @@ class EbayService:
             print(f"Error getting eBay application token: {str(e)}")
             return None
     
-    async def upload_image_to_eps(self, image_data: str, filename: str = "item_image.jpg") -> Optional[str]:
-        """Upload image to eBay Picture Service (EPS)"""
+    async def upload_image_to_eps(self, image_data: ImageData, filename: str = "item_image.jpg") -> Optional[str]:
+        """Upload image (raw bytes or base64) to eBay Picture Service (EPS)"""
         
         if not self.enabled:
             return None
             
         try:
-            # Convert base64 to file
-            image_bytes = base64.b64decode(image_data)
-            
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-                temp_file.write(image_bytes)
-                temp_path = temp_file.name
+            # Raw bytes go straight into the multipart body, no temp file needed
+            raw_image = image_bytes(image_data)
             
             # Prepare XML payload for EPS
             xml_payload = f"""<?xml version="1.0" encoding="utf-8"?>
@@ -89,7 +83,7 @@ class EbayService:
             # Prepare multipart form data
             files = {
                 'XML Payload': (None, xml_payload, 'text/xml'),
-                'image': (filename, open(temp_path, 'rb'), 'image/jpeg')
+                'image': (filename, raw_image, 'image/jpeg')
             }
             
             # eBay Trading API endpoint for picture upload
@@ -103,9 +97,6 @@ class EbayService:
             
             response = requests.post(upload_url, files=files, headers=headers)
             
-            # Clean up temp file
-            os.unlink(temp_path)
-            
             if response.status_code == 200:
                 # Parse XML response to get picture URL
                 import xml.etree.ElementTree as ET
@@ -0,0 +1,171 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import config
+
+class QueueFullError(Exception):
+    """Raised when the extraction queue is at its maximum depth"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Extraction queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class ExtractionQueue:
+    """Bounded queue of video extraction jobs run by a fixed pool of workers.
+
+    Waiting jobs are kept in one FIFO per user and workers take them round
+    robin across users, so one user uploading a batch of videos can't hold
+    up everyone else. ``submit`` refuses new jobs once ``max_depth`` are
+    waiting. ``on_position_change`` is awaited with the IDs of the jobs
+    whose place in line moved, so callers can tell clients about it.
+
+    The queue is per process: with several uvicorn workers, each runs its
+    own pool and the limits apply per worker.
+    """
+
+    def __init__(self, workers: int = None, max_depth: int = None,
+                 on_position_change: Callable[[List[str]], Awaitable] = None):
+        self.workers = max(1, workers or config.EXTRACTION_WORKERS)
+        self.max_depth = max_depth if max_depth is not None else config.EXTRACTION_QUEUE_MAX_DEPTH
+        self.on_position_change = on_position_change
+
+        self._waiting: "OrderedDict[str, Deque[Tuple[str, Callable[[], Awaitable]]]]" = OrderedDict()
+        self._depth = 0
+        self._running: Dict[str, asyncio.Task] = {}
+        self._ready = asyncio.Event()
+        self._worker_tasks: List[asyncio.Task] = []
+        # Seed for the Retry-After estimate until real job durations come in
+        self._average_seconds = config.EXTRACTION_JOB_SECONDS_ESTIMATE
+
+    def submit(self, job_id: str, user_id: str, run: Callable[[], Awaitable]) -> int:
+        """Queue ``run()`` for a job and return its 1-based position in line"""
+
+        if self.is_full():
+            raise QueueFullError(self.retry_after())
+
+        self._start_workers()
+        self._waiting.setdefault(user_id, deque()).append((job_id, run))
+        self._depth += 1
+        self._ready.set()
+        return self.position(job_id)
+
+    def is_full(self) -> bool:
+        return self._depth >= self.max_depth
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based place in line of a waiting job, or None once it has started (or isn't queued)"""
+
+        for position, waiting_id in enumerate(self._dispatch_order(), start=1):
+            if waiting_id == job_id:
+                return position
+        return None
+
+    def waiting_jobs(self) -> List[str]:
+        """IDs of the jobs waiting in line, in the order workers will take them"""
+
+        return self._dispatch_order()
+
+    def has_job(self, job_id: str) -> bool:
+        """Whether a job is waiting or running in this queue"""
+
+        return job_id in self._running or job_id in self._dispatch_order()
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up, from the average job duration"""
+
+        rounds = (self._depth + 1) / self.workers
+        return max(1, math.ceil(rounds * self._average_seconds))
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "running": len(self._running),
+            "waiting": self._depth,
+            "max_depth": self.max_depth,
+            "average_job_seconds": round(self._average_seconds, 1)
+        }
+
+    async def cancel(self, job_id: str) -> bool:
+        """Drop a waiting job, or cancel a running one and wait for it to unwind; False if neither"""
+
+        for user_id, jobs in self._waiting.items():
+            for job in jobs:
+                if job[0] == job_id:
+                    jobs.remove(job)
+                    if not jobs:
+                        del self._waiting[user_id]
+                    self._depth -= 1
+                    await self._notify_positions()
+                    return True
+
+        task = self._running.get(job_id)
+        if task is None:
+            return False
+        task.cancel()
+        await asyncio.wait({task})
+        return True
+
+    async def stop(self):
+        """Cancel the workers and any jobs they are running"""
+
+        for task in self._worker_tasks + list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, *self._running.values(), return_exceptions=True)
+        self._worker_tasks = []
+        self._running.clear()
+
+    def _start_workers(self):
+        # Started on first use so the tasks belong to the running event loop
+        if not self._worker_tasks:
+            self._worker_tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    def _dispatch_order(self) -> List[str]:
+        # Interleave the per-user lines the same way workers will take from them
+        lines = [list(jobs) for jobs in self._waiting.values()]
+        order = []
+        for round_index in range(max((len(line) for line in lines), default=0)):
+            order.extend(line[round_index][0] for line in lines if round_index < len(line))
+        return order
+
+    async def _notify_positions(self):
+        waiting_ids = self._dispatch_order()
+        if self.on_position_change and waiting_ids:
+            try:
+                await self.on_position_change(waiting_ids)
+            except Exception as e:
+                print(f"Error reporting extraction queue positions: {str(e)}")
+
+    def _next_job(self) -> Tuple[str, Callable[[], Awaitable]]:
+        # Take the first user's oldest job, then send that user to the back of the rotation
+        user_id, jobs = next(iter(self._waiting.items()))
+        job = jobs.popleft()
+        self._waiting.move_to_end(user_id)
+        if not jobs:
+            del self._waiting[user_id]
+        self._depth -= 1
+        return job
+
+    async def _work(self):
+        while True:
+            while not self._depth:
+                self._ready.clear()
+                await self._ready.wait()
+
+            job_id, run = self._next_job()
+
+            # Each job runs in its own task so it can be cancelled without taking its worker down
+            started = time.monotonic()
+            task = self._running[job_id] = asyncio.create_task(run())
+            try:
+                await self._notify_positions()
+                await asyncio.wait({task})
+                if not task.cancelled() and task.exception():
+                    print(f"Error running extraction job {job_id}: {str(task.exception())}")
+            finally:
+                del self._running[job_id]
+                # Exponential moving average keeps the estimate current without storing history;
+                # cancelled jobs stopped early and would make Retry-After too low
+                if task.done() and not task.cancelled():
+                    self._average_seconds = 0.8 * self._average_seconds + 0.2 * (time.monotonic() - started)
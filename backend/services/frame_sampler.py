@@ -0,0 +1,456 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import heapq
+import cv2
+import numpy as np
+
+def sample_frames(cap: cv2.VideoCapture, frame_indices: Iterable[int], seek_gap: int) -> Iterator[Tuple[int, np.ndarray]]:
+    """Decode only the requested frames of an open capture, in ascending order.
+
+    Short gaps are skipped with grab(), which demuxes and decodes without the
+    colour conversion and copy that retrieve() does. Gaps longer than
+    ``seek_gap`` frames are skipped by seeking, which lets the decoder jump to
+    the nearest keyframe instead of walking every frame in between.
+    """
+
+    position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+
+    for target in sorted(set(frame_indices)):
+        if target < position:
+            continue
+
+        if target - position > seek_gap:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            position = target
+
+        while position < target:
+            if not cap.grab():
+                return
+            position += 1
+
+        ret, frame = cap.read()
+        if not ret:
+            return
+        position += 1
+
+        yield target, frame
+
+def plan_sample_windows(total_frames: int, fps: float, budget: int, fallback_interval: float = 2.0) -> List[Tuple[int, int]]:
+    """Split a video into ``budget`` equal, contiguous windows of [start, end) frames.
+
+    Spreading the windows over the whole duration means a long walkthrough
+    costs the same number of samples as a short one but still covers every
+    part of the room. When the container doesn't report a frame count the
+    windows fall back to ``fallback_interval`` second spacing from the start.
+    """
+
+    budget = max(1, budget)
+
+    if total_frames <= 0:
+        step = max(1, int(fps * fallback_interval)) if fps > 0 else 1
+        return [(i * step, (i + 1) * step) for i in range(budget)]
+
+    budget = min(budget, total_frames)
+    bounds = [round(i * total_frames / budget) for i in range(budget + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(budget)]
+
+def window_candidates(start: int, end: int, count: int) -> List[int]:
+    """Evenly spaced candidate frames inside a [start, end) window"""
+
+    length = end - start
+    if count <= 1 or length <= 1:
+        return [(start + end - 1) // 2]
+
+    count = min(count, length)
+    step = length / count
+    return [start + int(step * (i + 0.5)) for i in range(count)]
+
+def sharpness_score(frame: np.ndarray) -> float:
+    """Variance of the Laplacian on a downscaled grayscale copy; low values mean motion blur"""
+
+    height, width = frame.shape[:2]
+    scale = min(1.0, 320 / width)
+    small = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+def select_sharpest_frames(cap: cv2.VideoCapture, windows: List[Tuple[int, int]], candidates_per_window: int,
+                           seek_gap: int) -> List[Tuple[int, np.ndarray, float]]:
+    """Decode a few candidates per window and keep the sharpest one of each.
+
+    Returns (frame_index, frame, sharpness) tuples, one per window that had
+    at least one decodable candidate, in frame order.
+    """
+
+    window_of = {}
+    for window_index, (start, end) in enumerate(windows):
+        for candidate in window_candidates(start, end, candidates_per_window):
+            window_of.setdefault(candidate, window_index)
+
+    best = {}
+    for index, frame in sample_frames(cap, window_of.keys(), seek_gap):
+        sharpness = sharpness_score(frame)
+        window_index = window_of[index]
+        if window_index not in best or sharpness > best[window_index][2]:
+            best[window_index] = (index, frame, sharpness)
+
+    return [best[window_index] for window_index in sorted(best)]
+
+def frame_signature(frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Cheap fingerprint for scene-change detection: a tiny grayscale thumbnail and a hue/saturation histogram"""
+
+    small = cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [16, 16], [0, 180, 0, 256])
+    cv2.normalize(hist, hist)
+    return gray, hist
+
+def scene_change_score(previous: Tuple[np.ndarray, np.ndarray], current: Tuple[np.ndarray, np.ndarray]) -> float:
+    """How much the view changed between two signatures, from 0 (same) to 1.
+
+    Uses whichever is larger of the share of thumbnail pixels that changed
+    noticeably (catches pans across similarly coloured walls) and the
+    histogram distance (catches new objects and lighting coming into view).
+    """
+
+    changed_pixels = float(np.mean(cv2.absdiff(previous[0], current[0]) > 25))
+    histogram_distance = float(cv2.compareHist(previous[1], current[1], cv2.HISTCMP_BHATTACHARYYA))
+    return max(changed_pixels, histogram_distance)
+
+def dhash(frame: np.ndarray, hash_size: int = 8) -> str:
+    """Difference hash of a frame as a hex string; visually similar frames differ in few bits"""
+
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = int.from_bytes(np.packbits(bits).tobytes(), "big")
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+def hamming_distance(first_hash: str, second_hash: str) -> int:
+    """Number of differing bits between two hex hashes"""
+    return bin(int(first_hash, 16) ^ int(second_hash, 16)).count("1")
+
+def encode_frame(frame: np.ndarray, max_edge: int, quality: int, byte_budget: int,
+                 min_quality: int = 50, quality_step: int = 10) -> Tuple[bytes, Dict]:
+    """JPEG-encode a frame for the vision model within a resolution and byte budget.
+
+    The frame is downscaled so its long edge is at most ``max_edge``, then
+    encoded at ``quality``; while the result is over ``byte_budget`` the
+    quality steps down until ``min_quality``. Returns the JPEG bytes and a
+    dict describing the encoding.
+    """
+
+    height, width = frame.shape[:2]
+    scale = min(1.0, max_edge / max(height, width))
+    if scale < 1.0:
+        frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    while True:
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if buffer.nbytes <= byte_budget or quality - quality_step < min_quality:
+            break
+        quality -= quality_step
+
+    encoded_height, encoded_width = frame.shape[:2]
+    return buffer.tobytes(), {
+        'width': encoded_width,
+        'height': encoded_height,
+        'jpeg_quality': quality,
+        'encoded_bytes': buffer.nbytes
+    }
+
+def crop_region(image: bytes, bbox: List[float], padding: float, min_edge: int, max_edge: int,
+                quality: int) -> Tuple[bytes, Dict]:
+    """Cut a padded bounding-box crop out of a JPEG frame and re-encode it.
+
+    ``bbox`` is [x1, y1, x2, y2] as fractions of the frame. The box grows by
+    ``padding`` of its size on every side, then to at least ``min_edge``
+    pixels per side where the frame allows, and the crop is downscaled so its
+    long edge is at most ``max_edge``. Returns the JPEG bytes and a dict
+    describing the crop.
+    """
+
+    frame = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+    height, width = frame.shape[:2]
+
+    x1, y1, x2, y2 = bbox[0] * width, bbox[1] * height, bbox[2] * width, bbox[3] * height
+    pad_x, pad_y = (x2 - x1) * padding, (y2 - y1) * padding
+    x1, y1, x2, y2 = x1 - pad_x, y1 - pad_y, x2 + pad_x, y2 + pad_y
+
+    # Grow tiny boxes around their centre so listing photos aren't a handful of pixels
+    if x2 - x1 < min_edge:
+        centre = (x1 + x2) / 2
+        x1, x2 = centre - min_edge / 2, centre + min_edge / 2
+    if y2 - y1 < min_edge:
+        centre = (y1 + y2) / 2
+        y1, y2 = centre - min_edge / 2, centre + min_edge / 2
+
+    # Slide boxes that hang off an edge back inside the frame before clamping
+    x1, x2 = x1 - max(0, x2 - width) - min(0, x1), x2 - max(0, x2 - width) - min(0, x1)
+    y1, y2 = y1 - max(0, y2 - height) - min(0, y1), y2 - max(0, y2 - height) - min(0, y1)
+
+    left, top = max(0, int(x1)), max(0, int(y1))
+    right, bottom = min(width, int(np.ceil(x2))), min(height, int(np.ceil(y2)))
+    crop = frame[top:bottom, left:right]
+
+    crop_data, encoding = encode_frame(crop, max_edge, quality, byte_budget=0, min_quality=quality)
+    encoding['region'] = [left, top, right, bottom]
+    return crop_data, encoding
+
+def mosaic_grid(tile_count: int) -> Tuple[int, int]:
+    """(rows, columns) of the most square grid that fits ``tile_count`` tiles"""
+
+    columns = int(np.ceil(np.sqrt(tile_count)))
+    rows = int(np.ceil(tile_count / columns))
+    return rows, columns
+
+def build_mosaic(frame_images: List[bytes], tile_edge: int, quality: int) -> Tuple[bytes, Dict]:
+    """Pack JPEG frames into one numbered grid image for a single vision-model call.
+
+    Each frame is downscaled to fit a ``tile_edge``-wide cell (cells take the
+    first frame's aspect ratio) and tiles are numbered 1..n left to right, top
+    to bottom, with the number drawn in the tile's corner so the model can say
+    which tile an item is in. Returns the JPEG bytes and a dict describing the grid.
+    """
+
+    frames = [cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR) for image in frame_images]
+    first_height, first_width = frames[0].shape[:2]
+    cell_width = tile_edge
+    cell_height = max(1, int(tile_edge * first_height / first_width))
+    rows, columns = mosaic_grid(len(frames))
+
+    mosaic = np.zeros((rows * cell_height, columns * cell_width, 3), dtype=np.uint8)
+    label_scale = max(0.6, cell_width / 400)
+
+    for tile_index, frame in enumerate(frames):
+        height, width = frame.shape[:2]
+        scale = min(cell_width / width, cell_height / height)
+        tile = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+
+        top = (tile_index // columns) * cell_height
+        left = (tile_index % columns) * cell_width
+        mosaic[top:top + tile.shape[0], left:left + tile.shape[1]] = tile
+
+        # White number on a black outline stays legible on any background
+        origin = (left + 10, top + int(30 * label_scale) + 10)
+        label = str(tile_index + 1)
+        cv2.putText(mosaic, label, origin, cv2.FONT_HERSHEY_SIMPLEX, label_scale, (0, 0, 0), 6)
+        cv2.putText(mosaic, label, origin, cv2.FONT_HERSHEY_SIMPLEX, label_scale, (255, 255, 255), 2)
+
+    _, buffer = cv2.imencode('.jpg', mosaic, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes(), {
+        'tiles': len(frames),
+        'rows': rows,
+        'columns': columns,
+        'width': mosaic.shape[1],
+        'height': mosaic.shape[0],
+        'encoded_bytes': buffer.nbytes
+    }
+
+def scan_scenes(cap: cv2.VideoCapture, probe_indices: Iterable[int], seek_gap: int, threshold: float) -> List[Dict]:
+    """Probe the stream and split it into scenes, where a new scene starts when the view changes.
+
+    Each scene is a run of probes that look like its first probe. Returns
+    one dict per scene in frame order, with the sharpest probe of the run
+    (``frame_number`` and ``sharpness``) rather than the often blurry frame
+    the camera was moving on, how much the view changed when the scene
+    started (``score``; None for the first scene, which has nothing to be
+    compared with) and the ``signature`` of its first probe.
+    """
+
+    scenes = []
+    for index, frame in sample_frames(cap, probe_indices, seek_gap):
+        signature = frame_signature(frame)
+        sharpness = sharpness_score(frame)
+
+        score = None
+        if scenes:
+            score = scene_change_score(scenes[-1]['signature'], signature)
+            if score < threshold:
+                # Same view: keep whichever probe of the scene is sharpest
+                if sharpness > scenes[-1]['sharpness']:
+                    scenes[-1].update(frame_number=index, sharpness=sharpness)
+                continue
+
+        scenes.append({'frame_number': index, 'score': score, 'sharpness': sharpness, 'signature': signature})
+
+    return scenes
+
+def select_scene_keyframes(segment_scenes: List[List[Dict]], threshold: float, max_keyframes: int) -> List[Dict]:
+    """Pick the keyframes of a whole video from the scenes its time segments were scanned into.
+
+    A segment's first scene is compared with the previous segment's last one
+    and merged into it if the view hadn't changed, so segment boundaries add
+    no keyframes of their own. The video's first scene is always kept; if
+    there are more scenes than ``max_keyframes``, the ones that started with
+    the biggest changes are kept. Returns scene dicts in frame order.
+    """
+
+    scenes = []
+    for segment in segment_scenes:
+        for scene in segment:
+            if scene['score'] is None and scenes:
+                score = scene_change_score(scenes[-1]['signature'], scene['signature'])
+                if score < threshold:
+                    if scene['sharpness'] > scenes[-1]['sharpness']:
+                        scenes[-1] = {**scenes[-1], 'frame_number': scene['frame_number'], 'sharpness': scene['sharpness']}
+                    continue
+                scene = {**scene, 'score': score}
+            scenes.append(scene)
+
+    if not scenes:
+        return []
+    first, rest = {**scenes[0], 'score': 1.0}, scenes[1:]
+    kept = [first] + heapq.nlargest(max(0, max_keyframes - 1), rest, key=lambda scene: scene['score'])
+    return sorted(kept, key=lambda scene: scene['frame_number'])
+
+def init_decode_worker():
+    """Process pool initializer: segments already run in parallel, so keep OpenCV single-threaded per worker"""
+    cv2.setNumThreads(1)
+
+def probe_video(video_path: str) -> Tuple[float, int]:
+    """Read a video's FPS and frame count without decoding it"""
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception("Could not open video file")
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return fps, total_frames
+
+def plan_decode_segments(total_frames: int, fps: float, budget: int,
+                         segment_seconds: float) -> List[Tuple[int, Optional[int], int]]:
+    """Split a video into independently decodable time segments that share the frame budget.
+
+    Returns (start_frame, end_frame, segment_budget) tuples; every segment
+    gets at least one frame, so there are never more segments than frames
+    in the budget. A video of unknown length is a single open-ended segment.
+    """
+
+    budget = max(1, budget)
+    if total_frames <= 0 or fps <= 0:
+        return [(0, None, budget)]
+
+    segment_frames = max(1, int(fps * segment_seconds))
+    count = max(1, min(budget, total_frames, -(-total_frames // segment_frames)))
+    bounds = [round(i * total_frames / count) for i in range(count + 1)]
+    budgets = [budget // count + (1 if i < budget % count else 0) for i in range(count)]
+    return [(bounds[i], bounds[i + 1], budgets[i]) for i in range(count)]
+
+def plan_scan_segments(total_frames: int, fps: float, segment_seconds: float) -> List[Tuple[int, int]]:
+    """Split a video of known length into [start, end) time segments that can be scanned for scenes in parallel"""
+
+    segment_frames = max(1, int(fps * segment_seconds))
+    count = max(1, -(-total_frames // segment_frames))
+    bounds = [round(i * total_frames / count) for i in range(count + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(count)]
+
+def scan_segment(video_path: str, start_frame: int, end_frame: int, options: Dict) -> List[Dict]:
+    """Scan one time segment of a video for scenes (see scan_scenes); takes and returns plain data for worker processes"""
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception("Could not open video file")
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        probe_step = max(1, int(fps / options['scene_probe_fps']))
+        return scan_scenes(
+            cap, range(start_frame, end_frame, probe_step),
+            max(1, int(fps * options['seek_gap_seconds'])), options['scene_threshold']
+        )
+    finally:
+        cap.release()
+
+def decode_frames(video_path: str, keyframes: List[Tuple[int, Optional[float]]], options: Dict) -> List[Dict]:
+    """Decode and encode chosen frames of a video, given as (frame_number, scene_score) pairs.
+
+    Used for keyframes picked by select_scene_keyframes; like decode_segment,
+    frames come back in frame order without IDs.
+    """
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception("Could not open video file")
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        scene_scores = dict(keyframes)
+        selected_frames = [
+            (frame_number, frame, scene_scores[frame_number], sharpness_score(frame))
+            for frame_number, frame in sample_frames(cap, sorted(scene_scores), max(1, int(fps * options['seek_gap_seconds'])))
+        ]
+        return encode_selected_frames(selected_frames, fps, options)
+    finally:
+        cap.release()
+
+def decode_segment(video_path: str, start_frame: int, end_frame: Optional[int], budget: int, options: Dict) -> List[Dict]:
+    """Select, decode and encode up to ``budget`` frames spread evenly over one time segment of a video.
+
+    ``options`` carries the selection and encoder settings (see
+    VideoProcessor.decode_options). Only plain data is taken and returned,
+    so segments can be decoded in worker threads or processes. Frames come
+    back in frame order without IDs; the caller numbers them. Scene
+    selection is done over the whole video instead, with scan_segment,
+    select_scene_keyframes and decode_frames.
+    """
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception("Could not open video file")
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        seek_gap = max(1, int(fps * options['seek_gap_seconds']))
+
+        # Spread the budget over the segment and keep the sharpest candidate per window
+        if end_frame is None:
+            windows = plan_sample_windows(0, fps, budget)
+        else:
+            windows = [
+                (start_frame + start, start_frame + end)
+                for start, end in plan_sample_windows(end_frame - start_frame, fps, budget)
+            ]
+        selected_frames = [
+            (frame_number, frame, None, sharpness)
+            for frame_number, frame, sharpness in select_sharpest_frames(
+                cap, windows, options['sharpness_candidates'], seek_gap
+            )
+        ]
+        return encode_selected_frames(selected_frames, fps, options)
+
+    finally:
+        cap.release()
+
+def encode_selected_frames(selected_frames: List[Tuple[int, np.ndarray, Optional[float], float]], fps: float,
+                           options: Dict) -> List[Dict]:
+    """Frame records for (frame_number, frame, scene_score, sharpness) tuples, JPEG-encoded for the vision model"""
+
+    frames = []
+    for frame_number, frame, scene_score, sharpness in selected_frames:
+        # Convert frame to JPEG within the vision model's resolution and size budget
+        jpeg_bytes, encoding = encode_frame(
+            frame,
+            max_edge=options['max_edge'],
+            quality=options['jpeg_quality'],
+            byte_budget=options['byte_budget'],
+            min_quality=options['min_quality']
+        )
+
+        frames.append({
+            'timestamp': frame_number / fps if fps > 0 else None,
+            'frame_data': jpeg_bytes,  # Raw JPEG bytes; base64 only at the API edges
+            'frame_number': frame_number,
+            'scene_score': scene_score,
+            'sharpness': round(sharpness, 1),
+            'phash': dhash(frame),
+            # 256-bit hash for detection cache keys, where 64 bits would let unrelated frames collide
+            'cache_hash': dhash(frame, 16),
+            # Decoded BGR size, free to measure, unlike a native-resolution JPEG
+            'raw_bytes': frame.nbytes,
+            **encoding
+        })
+
+    return frames
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Optional
+import cv2
+import numpy as np
+import config
+from services.image_data import ImageData, image_bytes
+
+FRAME_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+class FrameStore:
+    """Content-addressed on-disk store for frame and item images.
+
+    Images are stored once per distinct content under their SHA-256 prefix,
+    so identical frames from re-uploads share a file, and a frame ID can be
+    cached forever by clients because its content never changes.
+    """
+
+    def __init__(self, root: str = None, thumbnail_edge: int = None):
+        self.root = Path(root or config.FRAME_STORE_DIR)
+        self.thumbnail_edge = thumbnail_edge or config.FRAME_THUMBNAIL_EDGE
+
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def put(self, image_data: ImageData) -> str:
+        """Store JPEG data and return its frame ID"""
+
+        raw_image = image_bytes(image_data)
+        frame_id = hashlib.sha256(raw_image).hexdigest()[:32]
+        path = self._path(frame_id, "full")
+
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._write_atomic(path, raw_image)
+
+        return frame_id
+
+    def get(self, frame_id: str) -> Optional[bytes]:
+        """Read the full-size image for a frame ID"""
+
+        path = self.image_path(frame_id)
+        return path.read_bytes() if path else None
+
+    def image_path(self, frame_id: str, variant: str = "full") -> Optional[Path]:
+        """Get the file for a frame variant ("full" or "thumb"), creating thumbnails on first use"""
+
+        if not FRAME_ID_PATTERN.match(frame_id):
+            return None
+
+        full_path = self._path(frame_id, "full")
+        if not full_path.exists():
+            return None
+
+        if variant == "full":
+            return full_path
+
+        thumb_path = self._path(frame_id, "thumb")
+        if not thumb_path.exists():
+            self._write_atomic(thumb_path, self._make_thumbnail(full_path.read_bytes()))
+        return thumb_path
+
+    def delete(self, frame_id: str):
+        """Remove a frame's image and its thumbnail"""
+
+        if not FRAME_ID_PATTERN.match(frame_id):
+            return
+        for variant in ("full", "thumb"):
+            self._path(frame_id, variant).unlink(missing_ok=True)
+
+    def url(self, frame_id: str, variant: str = "full") -> str:
+        """API URL that serves a frame variant"""
+
+        url = f"/api/sell/frames/{frame_id}"
+        return url if variant == "full" else f"{url}?variant={variant}"
+
+    def _path(self, frame_id: str, variant: str) -> Path:
+        suffix = "" if variant == "full" else f"_{variant}"
+        return self.root / frame_id[:2] / f"{frame_id}{suffix}.jpg"
+
+    def _make_thumbnail(self, raw_image: bytes) -> bytes:
+        image = cv2.imdecode(np.frombuffer(raw_image, dtype=np.uint8), cv2.IMREAD_COLOR)
+        height, width = image.shape[:2]
+        scale = min(1.0, self.thumbnail_edge / max(height, width))
+        if scale < 1.0:
+            image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        return buffer.tobytes()
+
+    def _write_atomic(self, path: Path, data: bytes):
+        # Write to a temp file and rename so readers never see a partial image
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, path)
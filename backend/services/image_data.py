@@ -0,0 +1,27 @@
+import base64
+from typing import Union
+
+# Frames and item images are kept as raw JPEG bytes inside the backend and
+# shared by reference; base64 only exists at the edges (JSON responses and
+# data URLs). Clients may still send base64 strings back, so helpers accept both.
+ImageData = Union[bytes, bytearray, memoryview, str]
+
+def image_bytes(image_data: ImageData) -> bytes:
+    """Get raw image bytes from raw bytes or a base64 string"""
+
+    if isinstance(image_data, str):
+        return base64.b64decode(image_data)
+    if isinstance(image_data, bytes):
+        return image_data
+    return bytes(image_data)
+
+def image_base64(image_data: ImageData) -> str:
+    """Get a base64 string from raw bytes or an existing base64 string"""
+
+    if isinstance(image_data, str):
+        return image_data
+    return base64.b64encode(image_data).decode('utf-8')
+
+def image_data_url(image_data: ImageData, mime_type: str = "image/jpeg") -> str:
+    """Build a data URL for vision-model requests and browser previews"""
+    return f"data:{mime_type};base64,{image_base64(image_data)}"
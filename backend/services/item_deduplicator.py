@@ -0,0 +1,188 @@
+import hashlib
+import re
+from typing import Dict, List, Optional, Sequence
+import config
+from services.frame_sampler import hamming_distance
+
+# Words the vision model uses interchangeably for the same kind of item,
+# mapped to one canonical word before names are compared
+NAME_SYNONYMS = {
+    'couch': 'sofa',
+    'settee': 'sofa',
+    'loveseat': 'sofa',
+    'television': 'tv',
+    'telly': 'tv',
+    'screen': 'monitor',
+    'display': 'monitor',
+    'notebook': 'laptop',
+    'macbook': 'laptop',
+    'bookcase': 'bookshelf',
+    'shelving': 'bookshelf',
+    'shelf': 'bookshelf',
+    'chest': 'dresser',
+    'drawers': 'dresser',
+    'cupboard': 'cabinet',
+    'armchair': 'chair',
+    'recliner': 'chair',
+    'stool': 'chair',
+    'nightstand': 'table',
+    'bike': 'bicycle',
+    'cycle': 'bicycle',
+    'sneakers': 'shoes',
+    'trainers': 'shoes',
+    'boots': 'shoes',
+    'rucksack': 'backpack',
+    'handbag': 'bag',
+    'purse': 'bag',
+    'speakers': 'speaker',
+    'headphone': 'headphones'
+}
+
+def normalize_item_name(name: str) -> str:
+    """Lowercase an item name, drop punctuation and map synonyms word by word"""
+
+    words = re.findall(r"[a-z0-9]+", (name or "").lower())
+    return " ".join(NAME_SYNONYMS.get(word, word) for word in words) or "unknown"
+
+def item_kind(normalized_name: str) -> str:
+    """Head noun of a normalized name ("black leather sofa" -> "sofa"), used to bucket candidates"""
+    return normalized_name.rsplit(" ", 1)[-1]
+
+def names_compatible(first: str, second: str) -> bool:
+    """Whether two normalized names can describe the same item: one's words contain the other's"""
+
+    first_words, second_words = set(first.split()), set(second.split())
+    return first_words <= second_words or second_words <= first_words
+
+def normalize_bbox(value) -> Optional[List[float]]:
+    """[x1, y1, x2, y2] as fractions of the frame, or None if the model's box is unusable.
+
+    Boxes on a 0-1000 grid (which Qwen2-VL tends to produce) are rescaled.
+    """
+
+    if not isinstance(value, (list, tuple)) or len(value) != 4:
+        return None
+    try:
+        coords = [float(v) for v in value]
+    except (TypeError, ValueError):
+        return None
+
+    if max(coords) > 1.0:
+        coords = [v / 1000 for v in coords]
+
+    x1, y1, x2, y2 = [min(1.0, max(0.0, v)) for v in coords]
+    x1, x2 = sorted((x1, x2))
+    y1, y2 = sorted((y1, y2))
+    if x2 - x1 <= 0 or y2 - y1 <= 0:
+        return None
+    return [round(x1, 4), round(y1, 4), round(x2, 4), round(y2, 4)]
+
+def box_iou(first: Sequence[float], second: Sequence[float]) -> float:
+    """Intersection over union of two [x1, y1, x2, y2] boxes"""
+
+    width = min(first[2], second[2]) - max(first[0], second[0])
+    height = min(first[3], second[3]) - max(first[1], second[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+
+    intersection = width * height
+    union = ((first[2] - first[0]) * (first[3] - first[1]) +
+             (second[2] - second[0]) * (second[3] - second[1]) - intersection)
+    return intersection / union if union > 0 else 0.0
+
+class ItemDeduplicator:
+    """Groups per-frame detections into one record per physical item.
+
+    Detections are bucketed by the kind of item (synonym-normalized head
+    noun) and each one is only compared against the items already in its
+    bucket, so the pass costs O(n * k) for n detections and at most k items
+    of one kind. k is usually small (a room holds a few chairs, not dozens),
+    but a video full of one kind of item degrades towards O(n^2). Within a
+    bucket, a detection joins an item when:
+
+    - the item was last seen from the same view (frame hashes within
+      ``view_distance`` bits, or within ``window_seconds`` when frames have
+      no hash) and their bounding boxes overlap by at least ``iou_threshold``;
+    - or boxes can't be compared (the view has changed, or a box is
+      missing), the names are compatible, preferring an exact name match,
+      and the item was seen from the same view or within ``window_seconds``.
+
+    An item never takes two detections from the same frame, so two chairs
+    side by side stay two items, while a couch and a sofa seen from the same
+    spot become one.
+    """
+
+    def __init__(self, iou_threshold: float = None, view_distance: int = None, window_seconds: float = None):
+        self.iou_threshold = iou_threshold if iou_threshold is not None else config.ITEM_DEDUP_IOU_THRESHOLD
+        self.view_distance = view_distance if view_distance is not None else config.ITEM_DEDUP_VIEW_HAMMING
+        self.window_seconds = window_seconds if window_seconds is not None else config.ITEM_DEDUP_WINDOW_SECONDS
+
+    def group(self, detected_objects: List[Dict]) -> List[List[Dict]]:
+        """Group detections by physical item, in order of first sighting"""
+
+        buckets: Dict[str, List[Dict]] = {}
+        groups = []
+
+        for obj in sorted(detected_objects, key=lambda obj: obj['timestamp']):
+            name = normalize_item_name(obj['object_name'])
+            bucket = buckets.setdefault(item_kind(name), [])
+
+            best_group, best_score = None, 0.0
+            for group in bucket:
+                score = self._match_score(group, obj, name)
+                if score > best_score:
+                    best_group, best_score = group, score
+
+            if best_group is None:
+                best_group = {'name': name, 'frames': set(), 'detections': []}
+                bucket.append(best_group)
+                groups.append(best_group)
+
+            best_group['frames'].add(obj['frame_id'])
+            best_group['detections'].append(obj)
+            best_group['last'] = obj
+
+        return [group['detections'] for group in groups]
+
+    def item_id(self, detections: List[Dict], taken_ids: set) -> str:
+        """Stable ID from where an item was first seen, unique among ``taken_ids``"""
+
+        first = detections[0]
+        bbox = first.get('bbox') or []
+        key = "|".join([
+            normalize_item_name(first['object_name']),
+            first.get('frame_hash') or first['frame_id'],
+            ",".join(f"{v:.2f}" for v in bbox)
+        ])
+        item_id = f"item_{hashlib.sha1(key.encode()).hexdigest()[:12]}"
+
+        suffix = 2
+        unique_id = item_id
+        while unique_id in taken_ids:
+            unique_id = f"{item_id}_{suffix}"
+            suffix += 1
+        taken_ids.add(unique_id)
+        return unique_id
+
+    def _match_score(self, group: Dict, obj: Dict, name: str) -> float:
+        # 0 means no match; same-view box overlaps outrank name-only matches
+        if obj['frame_id'] in group['frames']:
+            return 0.0
+
+        last = group['last']
+        same_view = self._same_view(last, obj)
+        if same_view and last.get('bbox') and obj.get('bbox'):
+            iou = box_iou(last['bbox'], obj['bbox'])
+            return 2.0 + iou if iou >= self.iou_threshold else 0.0
+
+        # Names alone only carry an item across a short gap, not to a look-alike seen much later
+        if not same_view and abs(obj['timestamp'] - last['timestamp']) > self.window_seconds:
+            return 0.0
+        if name == group['name']:
+            return 1.0
+        return 0.5 if names_compatible(name, group['name']) else 0.0
+
+    def _same_view(self, first: Dict, second: Dict) -> bool:
+        if first.get('frame_hash') and second.get('frame_hash'):
+            return hamming_distance(first['frame_hash'], second['frame_hash']) <= self.view_distance
+        return abs(first['timestamp'] - second['timestamp']) <= self.window_seconds
@@ -0,0 +1,46 @@
+import asyncio
+from typing import Dict, Set
+
+class JobEventBus:
+    """Wakes event-stream subscribers when a job changes.
+
+    Subscribers hold no job state of their own: each wake-up only means
+    "the job's version moved", and the stream then reads whatever changed
+    since the last version it sent. Bursts of changes therefore coalesce
+    into one event, and a slow client never queues up stale ones.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Event]] = {}
+
+    def subscribe(self, job_id: str) -> asyncio.Event:
+        """Get an event that is set whenever the job changes"""
+
+        changed = asyncio.Event()
+        self._subscribers.setdefault(job_id, set()).add(changed)
+        return changed
+
+    def unsubscribe(self, job_id: str, changed: asyncio.Event):
+        """Stop waking a subscriber"""
+
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is not None:
+            subscribers.discard(changed)
+            if not subscribers:
+                del self._subscribers[job_id]
+
+    def publish(self, job_id: str):
+        """Wake every subscriber of a job"""
+
+        for changed in self._subscribers.get(job_id, ()):
+            changed.set()
+
+    async def wait(self, changed: asyncio.Event, timeout: float) -> bool:
+        """Wait until the job changes or ``timeout`` seconds pass; True if it changed"""
+
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        changed.clear()
+        return True
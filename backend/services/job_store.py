@@ -0,0 +1,420 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import config
+from services.frame_store import FrameStore
+
+# Image bytes never go into the database; records keep their frame store IDs
+IMAGE_FIELDS = ('frame_data', 'source_frame_data')
+IMAGE_ID_FIELDS = ('image_id', 'source_image_id')
+
+# Job columns update_job may change; dict values are stored as JSON
+JOB_FIELDS = ('status', 'stage', 'progress', 'error', 'metadata', 'metrics')
+JSON_JOB_FIELDS = ('metadata', 'metrics')
+
+class JobStore:
+    """SQLite-backed repository of extraction jobs, their frames and items.
+
+    Every change a client can see bumps the job's version, and each frame
+    and item row records the version it last changed at, which is what
+    delta polling and event streams read. The database runs in WAL mode so
+    several uvicorn workers can share it: readers never block the writer,
+    and version bumps happen inside write transactions.
+
+    Pipeline stages checkpoint their output here too, and a worker running
+    a job holds a lease on it, so an interrupted job can be resumed by
+    exactly one worker. Frame store images are shared between jobs with
+    identical frames, so each job's image IDs are tracked and an image is
+    only deleted with the last job that uses it.
+
+    Every call blocks on SQLite (and on writers in other workers), so async
+    code runs them with asyncio.to_thread.
+    """
+
+    def __init__(self, path: str = None, frame_store: FrameStore = None):
+        self.path = Path(path or config.JOB_STORE_PATH)
+        self.frame_store = frame_store or FrameStore()
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stage TEXT,
+                version INTEGER NOT NULL,
+                progress INTEGER NOT NULL,
+                filename TEXT,
+                frame_budget INTEGER,
+                fingerprint TEXT,
+                error TEXT,
+                metadata TEXT NOT NULL DEFAULT '{}',
+                metrics TEXT NOT NULL DEFAULT '{}',
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_user_id ON jobs (user_id, created_at);
+            CREATE INDEX IF NOT EXISTS jobs_fingerprint ON jobs (fingerprint);
+            CREATE TABLE IF NOT EXISTS frames (
+                job_id TEXT NOT NULL,
+                frame_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (job_id, frame_id)
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                job_id TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (job_id, item_id)
+            );
+            CREATE TABLE IF NOT EXISTS removed_items (
+                job_id TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                PRIMARY KEY (job_id, item_id)
+            );
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                job_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (job_id, name)
+            );
+            CREATE TABLE IF NOT EXISTS job_images (
+                job_id TEXT NOT NULL,
+                image_id TEXT NOT NULL,
+                PRIMARY KEY (job_id, image_id)
+            );
+            CREATE INDEX IF NOT EXISTS job_images_image_id ON job_images (image_id);
+            CREATE TABLE IF NOT EXISTS leases (
+                job_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+        """)
+
+    def create_job(self, job_id: str, user_id: str, filename: str, frame_budget: int, fingerprint: str = None):
+        """Insert a new job at version 1"""
+
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO jobs (job_id, user_id, status, stage, version, progress, filename, frame_budget, "
+                "fingerprint, created_at, updated_at) VALUES (?, ?, 'processing', 'uploaded', 1, 0, ?, ?, ?, ?, ?)",
+                (job_id, user_id, filename, frame_budget, fingerprint, now, now)
+            )
+
+    def get_job(self, job_id: str, since_version: int = 0, with_images: bool = False) -> Optional[Dict]:
+        """A job with its frames, items and removed item IDs changed after ``since_version``.
+
+        With ``with_images`` each record's ``frame_data`` (and
+        ``source_frame_data``) is read back from the frame store.
+        """
+
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            frames = self._db.execute(
+                "SELECT data, version FROM frames WHERE job_id = ? AND version > ? ORDER BY position",
+                (job_id, since_version)
+            ).fetchall()
+            items = self._db.execute(
+                "SELECT data, version FROM items WHERE job_id = ? AND version > ? ORDER BY position",
+                (job_id, since_version)
+            ).fetchall()
+            removed = self._db.execute(
+                "SELECT item_id, version FROM removed_items WHERE job_id = ? AND version > ?",
+                (job_id, since_version)
+            ).fetchall()
+
+        job = dict(row)
+        for field in JSON_JOB_FIELDS:
+            job[field] = json.loads(job[field])
+        job['frames'] = [self._load_record(frame, with_images) for frame in frames]
+        job['items'] = [self._load_record(item, with_images) for item in items]
+        job['removed_items'] = {item_id: version for item_id, version in removed}
+        return job
+
+    def get_version(self, job_id: str) -> Optional[int]:
+        """Current version of a job, or None if it doesn't exist"""
+
+        with self._lock:
+            row = self._db.execute("SELECT version FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_state(self, job_id: str) -> Optional[Tuple[int, str]]:
+        """Current version and status of a job, or None if it doesn't exist"""
+
+        with self._lock:
+            row = self._db.execute("SELECT version, status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def find_job_by_fingerprint(self, fingerprint: str, user_id: str) -> Optional[str]:
+        """Newest job of a user for an upload fingerprint that hasn't failed.
+
+        Jobs with frames whose vision requests failed (counted in their
+        ``failed_frames`` metric) are skipped too, since their items are
+        incomplete even when the job itself completed.
+        """
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT job_id FROM jobs WHERE fingerprint = ? AND user_id = ? AND status != 'failed' "
+                "AND COALESCE(json_extract(metrics, '$.failed_frames'), 0) = 0 ORDER BY created_at DESC LIMIT 1",
+                (fingerprint, user_id)
+            ).fetchone()
+        return row[0] if row else None
+
+    def update_job(self, job_id: str, **changes) -> Optional[int]:
+        """Set job fields; returns the new version, or None if nothing changed"""
+
+        unknown_fields = set(changes) - set(JOB_FIELDS)
+        if unknown_fields:
+            raise ValueError(f"Cannot update job fields: {', '.join(sorted(unknown_fields))}")
+
+        encoded = {
+            field: json.dumps(value, sort_keys=True) if field in JSON_JOB_FIELDS else value
+            for field, value in changes.items()
+        }
+
+        with self._transaction() as db:
+            row = db.execute(f"SELECT {', '.join(encoded)} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+
+            if all(row[field] == value for field, value in encoded.items()):
+                return None
+
+            assignments = ", ".join(f"{field} = ?" for field in encoded)
+            db.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*encoded.values(), job_id))
+            return self._bump_version(db, job_id)
+
+    def bump_version(self, job_id: str) -> Optional[int]:
+        """Advance a job's version without changing its fields; None if the job is gone"""
+
+        with self._transaction() as db:
+            return self._bump_version(db, job_id)
+
+    def add_frame(self, job_id: str, frame: Dict) -> int:
+        """Append a decoded frame to a job and return the version it was added at"""
+
+        with self._transaction() as db:
+            version = self._bump_version(db, job_id)
+            frame['version'] = version
+            # A frame decoded again by a resumed job keeps its place
+            db.execute(
+                "INSERT INTO frames (job_id, frame_id, position, version, data) VALUES "
+                "(?, ?, (SELECT COUNT(*) FROM frames WHERE job_id = ?), ?, ?) "
+                "ON CONFLICT (job_id, frame_id) DO UPDATE SET version = excluded.version, data = excluded.data",
+                (job_id, frame['id'], job_id, version, self._dump_record(frame))
+            )
+            self._track_images(db, job_id, frame)
+        return version
+
+    def publish_items(self, job_id: str, items: List[Dict]) -> Optional[int]:
+        """Replace a job's items; new and changed items get a new version, unchanged ones keep theirs.
+
+        Items that are no longer in the list are tombstoned at the new
+        version. Returns the new version, or None if nothing changed.
+        """
+
+        with self._transaction() as db:
+            previous = {
+                row['item_id']: (row['data'], row['version'])
+                for row in db.execute("SELECT item_id, data, version FROM items WHERE job_id = ?", (job_id,))
+            }
+            records = [self._dump_record(item) for item in items]
+
+            if len(items) == len(previous) and all(
+                item['id'] in previous and previous[item['id']][0] == record for item, record in zip(items, records)
+            ):
+                return None
+
+            version = self._bump_version(db, job_id)
+            db.execute("DELETE FROM items WHERE job_id = ?", (job_id,))
+            for position, (item, record) in enumerate(zip(items, records)):
+                unchanged = item['id'] in previous and previous[item['id']][0] == record
+                item['version'] = previous[item['id']][1] if unchanged else version
+                db.execute(
+                    "INSERT INTO items (job_id, item_id, position, version, data) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, item['id'], position, item['version'], record)
+                )
+                db.execute("DELETE FROM removed_items WHERE job_id = ? AND item_id = ?", (job_id, item['id']))
+                self._track_images(db, job_id, item)
+
+            # Partial results can merge two provisional items into one, which retires the other's ID
+            current_ids = {item['id'] for item in items}
+            for item_id in previous.keys() - current_ids:
+                db.execute(
+                    "INSERT OR REPLACE INTO removed_items (job_id, item_id, version) VALUES (?, ?, ?)",
+                    (job_id, item_id, version)
+                )
+        return version
+
+    def save_item(self, job_id: str, item: Dict) -> int:
+        """Insert or update one item at a new version, appending new items to the end"""
+
+        with self._transaction() as db:
+            version = self._bump_version(db, job_id)
+            item['version'] = version
+            db.execute(
+                "INSERT INTO items (job_id, item_id, position, version, data) VALUES "
+                "(?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM items WHERE job_id = ?), ?, ?) "
+                "ON CONFLICT (job_id, item_id) DO UPDATE SET version = excluded.version, data = excluded.data",
+                (job_id, item['id'], job_id, version, self._dump_record(item))
+            )
+            db.execute("DELETE FROM removed_items WHERE job_id = ? AND item_id = ?", (job_id, item['id']))
+            self._track_images(db, job_id, item)
+        return version
+
+    def delete_item(self, job_id: str, item_id: str) -> Optional[int]:
+        """Remove an item, leaving a tombstone; returns the new version, or None if it wasn't there"""
+
+        with self._transaction() as db:
+            if db.execute("DELETE FROM items WHERE job_id = ? AND item_id = ?", (job_id, item_id)).rowcount == 0:
+                return None
+            version = self._bump_version(db, job_id)
+            db.execute(
+                "INSERT OR REPLACE INTO removed_items (job_id, item_id, version) VALUES (?, ?, ?)",
+                (job_id, item_id, version)
+            )
+        return version
+
+    def save_checkpoint(self, job_id: str, name: str, data) -> bool:
+        """Record the JSON-serializable output of a pipeline step, replacing any earlier one.
+
+        Returns False, saving nothing, if the job has been deleted.
+        """
+
+        with self._transaction() as db:
+            return db.execute(
+                "INSERT OR REPLACE INTO checkpoints (job_id, name, data) "
+                "SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM jobs WHERE job_id = ?)",
+                (job_id, name, json.dumps(data, sort_keys=True), job_id)
+            ).rowcount > 0
+
+    def get_checkpoints(self, job_id: str) -> Dict:
+        """All checkpoints of a job, by name"""
+
+        with self._lock:
+            rows = self._db.execute("SELECT name, data FROM checkpoints WHERE job_id = ?", (job_id,)).fetchall()
+        return {row['name']: json.loads(row['data']) for row in rows}
+
+    def list_unfinished_jobs(self) -> List[Dict]:
+        """Jobs still queued or processing that no worker holds a live lease on, oldest first.
+
+        These were interrupted by a crash or deploy and can be resumed.
+        """
+
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT jobs.job_id, jobs.user_id FROM jobs LEFT JOIN leases "
+                "ON leases.job_id = jobs.job_id AND leases.expires_at > ? "
+                "WHERE jobs.status = 'processing' AND leases.job_id IS NULL ORDER BY jobs.created_at",
+                (time.time(),)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def claim_job(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """Take or renew the lease on a job; False while another owner's lease is live"""
+
+        now = time.time()
+        with self._transaction() as db:
+            if db.execute("SELECT 1 FROM jobs WHERE job_id = ?", (job_id,)).fetchone() is None:
+                return False
+            lease = db.execute("SELECT owner, expires_at FROM leases WHERE job_id = ?", (job_id,)).fetchone()
+            if lease is not None and lease['owner'] != owner and lease['expires_at'] > now:
+                return False
+            db.execute(
+                "INSERT OR REPLACE INTO leases (job_id, owner, expires_at) VALUES (?, ?, ?)",
+                (job_id, owner, now + lease_seconds)
+            )
+        return True
+
+    def release_job(self, job_id: str, owner: str):
+        """Give up a lease taken with claim_job"""
+
+        with self._transaction() as db:
+            db.execute("DELETE FROM leases WHERE job_id = ? AND owner = ?", (job_id, owner))
+
+    def delete_job(self, job_id: str) -> bool:
+        """Delete a job, everything recorded for it and the images no other job uses"""
+
+        with self._transaction() as db:
+            orphaned_images = [row[0] for row in db.execute(
+                "SELECT image_id FROM job_images WHERE job_id = ? AND image_id NOT IN "
+                "(SELECT image_id FROM job_images WHERE job_id != ?)", (job_id, job_id)
+            )]
+            for table in ('frames', 'items', 'removed_items', 'checkpoints', 'leases', 'job_images'):
+                db.execute(f"DELETE FROM {table} WHERE job_id = ?", (job_id,))
+            deleted = db.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,)).rowcount > 0
+
+        for image_id in orphaned_images:
+            self.frame_store.delete(image_id)
+        return deleted
+
+    def purge_jobs(self, max_age_seconds: float) -> List[str]:
+        """Delete jobs created more than ``max_age_seconds`` ago and return their IDs"""
+
+        with self._lock:
+            job_ids = [row[0] for row in self._db.execute(
+                "SELECT job_id FROM jobs WHERE created_at < ?", (time.time() - max_age_seconds,)
+            )]
+        for job_id in job_ids:
+            self.delete_job(job_id)
+
+        if job_ids:
+            print(f"Purged {len(job_ids)} extraction jobs older than {max_age_seconds / 3600:.0f}h")
+        return job_ids
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write
+        # sequences like version bumps can't interleave across workers
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _bump_version(self, db: sqlite3.Connection, job_id: str) -> Optional[int]:
+        db.execute("UPDATE jobs SET version = version + 1, updated_at = ? WHERE job_id = ?", (time.time(), job_id))
+        row = db.execute("SELECT version FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def _track_images(self, db: sqlite3.Connection, job_id: str, record: Dict):
+        for field in IMAGE_ID_FIELDS:
+            if record.get(field):
+                db.execute("INSERT OR IGNORE INTO job_images (job_id, image_id) VALUES (?, ?)", (job_id, record[field]))
+
+    def _dump_record(self, record: Dict) -> str:
+        return json.dumps(
+            {key: value for key, value in record.items() if key not in IMAGE_FIELDS and key != 'version'},
+            sort_keys=True
+        )
+
+    def _load_record(self, row: sqlite3.Row, with_images: bool) -> Dict:
+        record = json.loads(row['data'])
+        record['version'] = row['version']
+        if with_images:
+            if record.get('image_id'):
+                record['frame_data'] = self.frame_store.get(record['image_id'])
+            if record.get('source_image_id'):
+                record['source_frame_data'] = self.frame_store.get(record['source_image_id'])
+        return record
@@ -3,6 +3,8 @@ from openai import OpenAI
 import json
 from typing import Dict, List
 import uuid
+from services.image_data import image_base64
+from services.bounded_state import BoundedStateMap, StateSpill
 
 class ListingGenerator:
     def __init__(self):
@@ -11,13 +13,18 @@ class ListingGenerator:
             api_key=config.NEBIUS_API_KEY
         )
         
-        # Store active negotiations
-        self.negotiations = {}
+        # Store active negotiations; evicted ones are spilled to disk and loaded back on demand
+        spill = StateSpill("listing_negotiations")
+        spill.purge(config.STATE_SPILL_RETENTION_HOURS * 3600)
+        self.negotiations = BoundedStateMap("listing_negotiations", on_evict=spill.save, loader=spill.load)
     
     async def create_listing(self, item: Dict) -> Dict:
         """Generate marketplace listing for an item"""
         
         try:
+            # Listings are returned as JSON, so the image is base64-encoded once here
+            image_data = image_base64(item['frame_data'])
+            
             prompt = f"""
             Create a compelling marketplace listing for this item:
             
@@ -54,7 +61,7 @@ class ListingGenerator:
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/jpeg;base64,{item['frame_data']}"
+                                    "url": f"data:image/jpeg;base64,{image_data}"
                                 }
                             }
                         ]
@@ -98,7 +105,7 @@ class ListingGenerator:
                 "condition": item['condition'],
                 "condition_details": listing_data.get("condition_details", ""),
                 "category": item['category'],
-                "image_data": item['frame_data'],
+                "image_data": image_data,
                 "timestamp": item['timestamp'],
                 "status": "draft",
                 "ai_response": ai_response
@@ -180,11 +187,12 @@ class ListingGenerator:
                     "reasoning": "Standard response due to parsing error"
                 }
             
-            # Store seller response
+            # Store seller response (assigned back so the map re-estimates its size)
             negotiation["messages"].append({
                 "role": "seller", 
                 "message": negotiation_result.get("response", "")
             })
+            self.negotiations[listing_id] = negotiation
             
             return {
                 "listing_id": listing_id,
@@ -11,6 +11,7 @@ from webdriver_manager.chrome import ChromeDriverManager
 import undetected_chromedriver as uc
 from typing import Dict, List
 import config
+from services.image_data import ImageData, image_bytes
 
 class MarketplaceAutomation:
     def __init__(self):
@@ -173,17 +174,16 @@ class MarketplaceAutomation:
             print(f"Failed to post listing: {str(e)}")
             return False
     
-    def upload_photos(self, image_data: str):
-        """Upload photos from base64 data"""
+    def upload_photos(self, image_data: ImageData):
+        """Upload photos from raw image bytes or base64 data"""
         try:
-            # Convert base64 to file
-            import base64
+            # The browser needs a file on disk to attach
             import tempfile
             
-            image_bytes = base64.b64decode(image_data)
+            raw_image = image_bytes(image_data)
             
             with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-                temp_file.write(image_bytes)
+                temp_file.write(raw_image)
                 temp_path = temp_file.name
             
             # Find upload button
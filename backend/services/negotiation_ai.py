@@ -4,6 +4,7 @@ import json
 from typing import Dict, List
 import time
 from datetime import datetime, timedelta
+from services.bounded_state import BoundedStateMap, StateSpill
 
 class NegotiationAI:
     def __init__(self):
@@ -12,8 +13,10 @@ class NegotiationAI:
             api_key=config.NEBIUS_API_KEY
         )
         
-        # Store conversation history
-        self.conversations = {}
+        # Store conversation history; evicted conversations are spilled to disk and loaded back on demand
+        spill = StateSpill("negotiation_conversations")
+        spill.purge(config.STATE_SPILL_RETENTION_HOURS * 3600)
+        self.conversations = BoundedStateMap("negotiation_conversations", on_evict=spill.save, loader=spill.load)
         
     def handle_buyer_message(self, listing_id: str, buyer_message: str, listing_data: Dict, conversation_history: List = None):
         """Generate AI response to buyer message"""
@@ -108,14 +111,13 @@ class NegotiationAI:
                     "next_steps": "Continue conversation"
                 }
             
-            # Store conversation
-            if listing_id not in self.conversations:
-                self.conversations[listing_id] = []
-                
-            self.conversations[listing_id].extend([
+            # Store conversation (assigned back so the map re-estimates its size)
+            conversation = self.conversations.get(listing_id, [])
+            conversation.extend([
                 {"role": "buyer", "message": buyer_message, "timestamp": datetime.now().isoformat()},
                 {"role": "seller", "message": result["response"], "timestamp": datetime.now().isoformat()}
             ])
+            self.conversations[listing_id] = conversation
             
             return {
                 "listing_id": listing_id,
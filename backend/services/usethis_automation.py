@@ -11,8 +11,8 @@ from webdriver_manager.chrome import ChromeDriverManager
 import undetected_chromedriver as uc
 from typing import Dict, List
 import config
-import base64
 import tempfile
+from services.image_data import ImageData, image_bytes
 
 class UseThisAutomation:
     def __init__(self):
@@ -274,14 +274,14 @@ class UseThisAutomation:
             print(f"Failed to post to UseThis: {str(e)}")
             return False
     
-    def upload_photos(self, image_data: str):
-        """Upload photos from base64 data"""
+    def upload_photos(self, image_data: ImageData):
+        """Upload photos from raw image bytes or base64 data"""
         try:
-            # Convert base64 to file
-            image_bytes = base64.b64decode(image_data)
+            # The browser needs a file on disk to attach
+            raw_image = image_bytes(image_data)
             
             with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-                temp_file.write(image_bytes)
+                temp_file.write(raw_image)
                 temp_path = temp_file.name
             
             # Find upload button/input
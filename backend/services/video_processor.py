@@ -1,19 +1,115 @@
 import config
-from openai import OpenAI
-import base64
+from openai import AsyncOpenAI
+import hashlib
 import json
-from typing import List, Dict
-import tempfile
-import os
-import cv2
-import numpy as np
+import asyncio
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Optional, AsyncIterator, Awaitable, Callable, Iterable
+from services.image_data import ImageData, image_bytes, image_data_url
+from services.detection_cache import DetectionCache
+from services.item_deduplicator import ItemDeduplicator, normalize_bbox
+from services.frame_sampler import probe_video, plan_decode_segments, decode_segment, plan_scan_segments, scan_segment, select_scene_keyframes, decode_frames, hamming_distance, init_decode_worker, build_mosaic, crop_region
+
+# OpenCV decoding runs in a dedicated process pool shared by every VideoProcessor,
+# so a long video never blocks the event loop or hogs more than its share of cores
+_decode_pool: Optional[ProcessPoolExecutor] = None
+
+def get_decode_pool() -> ProcessPoolExecutor:
+    """Get the shared decode process pool, starting it on first use.
+    
+    Workers are spawned, so each one re-imports the launching ``__main__``
+    module. Serve the app with ``uvicorn main:app`` (``python main.py`` does
+    this for you) so that is uvicorn's entry point rather than the app.
+    """
+    
+    global _decode_pool
+    if _decode_pool is None:
+        _decode_pool = ProcessPoolExecutor(
+            max_workers=config.VIDEO_DECODE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_decode_worker
+        )
+        print(f"Started video decode pool with {config.VIDEO_DECODE_WORKERS} workers")
+    return _decode_pool
+
+def shutdown_decode_pool():
+    """Stop the decode pool's worker processes"""
+    
+    global _decode_pool
+    if _decode_pool is not None:
+        _decode_pool.shutdown(wait=False, cancel_futures=True)
+        _decode_pool = None
+
+# Cached detections are only reused while the prompts they came from are unchanged
+DETECTION_PROMPT = """
+    Analyze this video frame and identify sellable household items that could be sold on a marketplace.
+    
+    Look for items like:
+    - Furniture (chairs, tables, sofas, beds, desks, bookshelves)
+    - Electronics (TVs, laptops, monitors, speakers, phones, tablets)
+    - Appliances (microwaves, toasters, blenders, coffee makers)
+    - Decor items (lamps, mirrors, picture frames, vases, clocks)
+    - Sports equipment (bicycles, exercise equipment)
+    - Books and magazines
+    - Clothing and accessories (jackets, shoes, bags)
+    
+    Return a JSON array of detected sellable items:
+    [
+        {
+            "object_name": "specific item name",
+            "category": "furniture/electronics/appliances/decor/sports/books/clothing",
+            "confidence": 0.85,
+            "condition": "excellent/good/fair/poor",
+            "estimated_value": 50,
+            "description": "brief description of the item",
+            "bbox": [0.12, 0.40, 0.38, 0.85]
+        }
+    ]
+    
+    "bbox" is the item's bounding box as [x1, y1, x2, y2] fractions (0 to 1) of the image width and height.
+    List every separate physical item, e.g. two chairs as two entries.
+    Only include items that would realistically be sellable on Facebook Marketplace or similar platforms.
+    Be specific with item names (e.g., "office chair" not just "chair").
+    Estimate realistic prices in USD.
+    """
+
+MOSAIC_PROMPT = """
+    This image is a grid of {tile_count} frames from the same video, numbered 1 to {tile_count}
+    left to right, top to bottom; each tile's number is written in its top-left corner.
+    Add a "tile" field to every item with the number of the tile where it is most clearly visible,
+    and give its "bbox" as fractions of that tile rather than of the whole grid.
+    List each physical item only once, even if it appears in several tiles.
+    """
+
+DETECTION_PROMPT_VERSION = hashlib.sha256((DETECTION_PROMPT + MOSAIC_PROMPT).encode()).hexdigest()[:16]
+
+# Caps in-flight vision-model requests across every job in this process
+_vision_call_limit: Optional[asyncio.Semaphore] = None
+
+def get_vision_call_limit() -> asyncio.Semaphore:
+    """Get the process-wide vision request semaphore"""
+    
+    global _vision_call_limit
+    if _vision_call_limit is None:
+        _vision_call_limit = asyncio.Semaphore(config.VISION_GLOBAL_CONCURRENCY)
+    return _vision_call_limit
 
 class VideoProcessor:
     def __init__(self):
-        self.client = OpenAI(
+        self.client = AsyncOpenAI(
             base_url="https://api.studio.nebius.ai/v1/",
             api_key=config.NEBIUS_API_KEY
         )
+        self.vision_model = "Qwen/Qwen2-VL-72B-Instruct"
+        
+        self.detection_cache = DetectionCache() if config.DETECTION_CACHE_ENABLED else None
+        if self.detection_cache:
+            self.detection_cache.purge_stale(self.vision_model, DETECTION_PROMPT_VERSION)
+        
+        self.item_deduplicator = ItemDeduplicator()
         
         # Common sellable household items for suggestions
         self.sellable_categories = {
@@ -26,169 +122,479 @@ class VideoProcessor:
             'clothing': ['jacket', 'shoes', 'bag', 'backpack']
         }
     
-    async def extract_frames(self, video_data: bytes) -> List[Dict]:
-        """Extract actual frames from video using OpenCV"""
+    def resolve_frame_budget(self, requested: Optional[int] = None) -> int:
+        """Get the frame budget for a job, capped by the deployment tier"""
+        
+        if requested is None:
+            return config.FRAME_BUDGET_DEFAULT
+        return max(1, min(int(requested), config.FRAME_BUDGET_MAX))
+    
+    def decode_options(self) -> Dict:
+        """Frame selection and encoder settings handed to the decode pool workers"""
+        
+        return {
+            'selection': config.VIDEO_FRAME_SELECTION,
+            'seek_gap_seconds': config.VIDEO_SEEK_MIN_GAP_SECONDS,
+            'scene_probe_fps': config.VIDEO_SCENE_PROBE_FPS,
+            'scene_threshold': config.VIDEO_SCENE_CHANGE_THRESHOLD,
+            'sharpness_candidates': config.VIDEO_SHARPNESS_CANDIDATES,
+            'max_edge': config.VIDEO_FRAME_MAX_EDGE,
+            'jpeg_quality': config.VIDEO_JPEG_QUALITY,
+            'min_quality': config.VIDEO_JPEG_MIN_QUALITY,
+            'byte_budget': config.VIDEO_FRAME_BYTE_BUDGET
+        }
+    
+    async def iter_frames(self, video_path: str, frame_budget: Optional[int] = None) -> AsyncIterator[Dict]:
+        """Yield frames spread across the whole video, in timestamp order, as time segments finish decoding.
+        
+        Segments are decoded in parallel in the decode process pool, with at
+        most VIDEO_DECODE_WORKERS segments of this video in flight at a time.
+        Scene selection first scans every segment for scenes, then picks the
+        keyframes over the whole video, so the budget goes to the biggest
+        view changes wherever they are rather than being split per segment.
+        """
+        
+        frame_budget = frame_budget or self.resolve_frame_budget()
         
         try:
-            # Save video data to temporary file
-            with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as temp_file:
-                temp_file.write(video_data)
-                temp_video_path = temp_file.name
-            
-            # Open video with OpenCV
-            cap = cv2.VideoCapture(temp_video_path)
-            
-            if not cap.isOpened():
-                raise Exception("Could not open video file")
-            
-            # Get video properties
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            duration = total_frames / fps if fps > 0 else 0
-            
-            print(f"Video info: {fps} FPS, {total_frames} frames, {duration:.2f}s duration")
+            fps, total_frames = await asyncio.to_thread(probe_video, video_path)
+        except Exception as e:
+            raise Exception(f"Error extracting frames: {str(e)}")
+        
+        duration = total_frames / fps if fps > 0 else 0
+        print(f"Video info: {fps} FPS, {total_frames} frames, {duration:.2f}s duration")
+        
+        options = self.decode_options()
+        if options['selection'] == "scene" and total_frames > 0 and fps > 0:
+            scan_segments = plan_scan_segments(total_frames, fps, config.VIDEO_DECODE_SEGMENT_SECONDS)
+            segment_scenes = [
+                scenes async for scenes in self._map_decode_pool(
+                    (scan_segment, video_path, start_frame, end_frame, options)
+                    for start_frame, end_frame in scan_segments
+                )
+            ]
+            keyframes = select_scene_keyframes(segment_scenes, options['scene_threshold'], frame_budget)
             
-            frames = []
-            frame_interval = max(1, int(fps * 2))  # Extract frame every 2 seconds
+            # Decode the chosen keyframes grouped by the segment they were found in
+            keyframes_by_segment = [
+                [
+                    (keyframe['frame_number'], keyframe['score']) for keyframe in keyframes
+                    if start_frame <= keyframe['frame_number'] < end_frame
+                ]
+                for start_frame, end_frame in scan_segments
+            ]
+            jobs = (
+                (decode_frames, video_path, segment_keyframes, options)
+                for segment_keyframes in keyframes_by_segment if segment_keyframes
+            )
+        else:
+            jobs = (
+                (decode_segment, video_path, start_frame, end_frame, segment_budget, options)
+                for start_frame, end_frame, segment_budget in plan_decode_segments(
+                    total_frames, fps, frame_budget, config.VIDEO_DECODE_SEGMENT_SECONDS
+                )
+            )
+        
+        extracted_count = 0
+        results = self._map_decode_pool(jobs)
+        try:
+            async for segment_frames in results:
+                for frame in segment_frames:
+                    if frame['timestamp'] is None:
+                        frame['timestamp'] = extracted_count * 2
+                    frame['id'] = f"frame_{extracted_count}"
+                    frame['items'] = []
+                    extracted_count += 1
+                    
+                    print(f"Extracted frame {extracted_count} at {frame['timestamp']:.1f}s")
+                    yield frame
+        finally:
+            # Cancel segments still in flight if the consumer stops early
+            await results.aclose()
+        
+        print(f"Extracted {extracted_count} frames from video (budget {frame_budget})")
+    
+    async def _map_decode_pool(self, jobs: Iterable[tuple]) -> AsyncIterator:
+        """Run ``(function, *args)`` jobs in the decode pool and yield their results in submission order.
+        
+        At most VIDEO_DECODE_WORKERS jobs are in flight at a time; jobs not
+        started yet are dropped if the consumer stops early.
+        """
+        
+        jobs = iter(jobs)
+        loop = asyncio.get_running_loop()
+        pool = get_decode_pool()
+        in_flight = deque()
+        
+        def submit_next_job() -> bool:
+            job = next(jobs, None)
+            if job is None:
+                return False
+            in_flight.append(loop.run_in_executor(pool, *job))
+            return True
+        
+        try:
+            while len(in_flight) < config.VIDEO_DECODE_WORKERS and submit_next_job():
+                pass
             
-            frame_count = 0
-            extracted_count = 0
+            while in_flight:
+                try:
+                    result = await in_flight.popleft()
+                except BrokenProcessPool:
+                    shutdown_decode_pool()
+                    raise Exception("Error extracting frames: decode worker crashed")
+                except Exception as e:
+                    raise Exception(f"Error extracting frames: {str(e)}")
+                
+                submit_next_job()
+                yield result
+        
+        finally:
+            for future in in_flight:
+                future.cancel()
+    
+    async def extract_frames(self, video_path: str, frame_budget: Optional[int] = None) -> List[Dict]:
+        """Extract frames spread across the whole video using OpenCV"""
+        return [frame async for frame in self.iter_frames(video_path, frame_budget)]
+    
+    def summarize_encoding(self, frames: List[Dict]) -> Dict:
+        """Bytes-per-frame of the decoded frames and of the JPEGs sent to the model, for job metadata"""
+        
+        encoded_frames = [frame for frame in frames if 'encoded_bytes' in frame]
+        if not encoded_frames:
+            return {}
+        
+        raw_total = sum(frame['raw_bytes'] for frame in encoded_frames)
+        encoded_total = sum(frame['encoded_bytes'] for frame in encoded_frames)
+        
+        return {
+            "frames": len(encoded_frames),
+            "raw_bytes_per_frame": raw_total // len(encoded_frames),
+            "encoded_bytes_per_frame": encoded_total // len(encoded_frames),
+            "raw_bytes_total": raw_total,
+            "encoded_bytes_total": encoded_total,
+            "reduction": round(1 - encoded_total / raw_total, 3) if raw_total else 0,
+            "max_long_edge": config.VIDEO_FRAME_MAX_EDGE,
+            "byte_budget": config.VIDEO_FRAME_BYTE_BUDGET
+        }
+    
+    def find_duplicate_frame(self, frame_info: Dict, kept_frames: List[Dict], max_distance: Optional[int] = None) -> Optional[str]:
+        """ID of an already kept frame that looks the same as this one, by perceptual hash"""
+        
+        if max_distance is None:
+            max_distance = config.FRAME_DEDUP_HAMMING_THRESHOLD
+        
+        frame_hash = frame_info.get('phash')
+        if not frame_hash:
+            return None
+        
+        for kept in kept_frames:
+            if kept.get('phash') and hamming_distance(frame_hash, kept['phash']) <= max_distance:
+                return kept['id']
+        return None
+    
+    def deduplicate_frames(self, frames: List[Dict], max_distance: Optional[int] = None) -> List[Dict]:
+        """Collapse near-duplicate frames by perceptual hash, keeping the first of each group"""
+        
+        unique_frames = []
+        for frame_info in frames:
+            duplicate_of = self.find_duplicate_frame(frame_info, unique_frames, max_distance)
+            if duplicate_of:
+                frame_info['duplicate_of'] = duplicate_of
+            else:
+                unique_frames.append(frame_info)
+        
+        if len(unique_frames) < len(frames):
+            print(f"Skipped {len(frames) - len(unique_frames)} near-duplicate frames before object detection")
+        
+        return unique_frames
+    
+    async def detect_objects_streaming(self, frame_stream: AsyncIterator[Dict],
+                                       on_frame: Optional[Callable[[Dict], Awaitable]] = None,
+                                       on_detections: Optional[Callable[[Dict, List[Dict]], Awaitable]] = None,
+                                       max_concurrency: Optional[int] = None,
+                                       detection_mode: Optional[str] = None,
+                                       known_detections: Optional[Dict[str, List[Dict]]] = None) -> List[Dict]:
+        """Detection stage that consumes frames while they are still being decoded.
+        
+        A frame's vision request starts as soon as the frame arrives, so decoding
+        carries on while earlier requests are in flight. At most ``max_concurrency``
+        requests (VISION_JOB_CONCURRENCY by default) run for this job at once.
+        In "mosaic" mode (VISION_DETECTION_MODE) frames are collected into
+        batches of VISION_MOSAIC_TILES and each batch is one request.
+        Frames whose items are in the detection cache, or in ``known_detections``
+        (objects by frame ID without ``frame_data``, e.g. saved by an interrupted
+        run of the same job), skip the request.
+        ``on_frame`` is awaited with every decoded frame (duplicates included,
+        after ``duplicate_of`` is set) and ``on_detections`` with each frame's
+        objects as soon as that frame's request completes.
+        """
+        
+        job_limit = asyncio.Semaphore(max_concurrency or config.VISION_JOB_CONCURRENCY)
+        mode = detection_mode or config.VISION_DETECTION_MODE
+        batch_size = config.VISION_MOSAIC_TILES if mode == "mosaic" else 1
+        kept_frames = []
+        pending_batch = []
+        detection_tasks = []
+        frame_results = []  # per kept frame or batch, in frame order: cached objects or a detection task
+        
+        async def detect_and_report(frame_batch: List[Dict]) -> List[Dict]:
+            async with job_limit:
+                if len(frame_batch) > 1:
+                    batch_objects = await self.detect_objects_in_mosaic(frame_batch)
+                else:
+                    batch_objects = [await self.detect_objects_in_frame(frame_batch[0])]
             
-            while cap.isOpened() and extracted_count < 5:  # Limit to 5 frames
-                ret, frame = cap.read()
-                if not ret:
-                    break
+            if on_detections:
+                for frame_info, objects in zip(frame_batch, batch_objects):
+                    await on_detections(frame_info, objects)
+            return [obj for objects in batch_objects for obj in objects]
+        
+        def submit_pending_batch():
+            detection_tasks.append(asyncio.create_task(detect_and_report(list(pending_batch))))
+            frame_results.append(detection_tasks[-1])
+            pending_batch.clear()
+        
+        try:
+            async for frame_info in frame_stream:
+                # Each near-duplicate frame would cost a full vision-model call for the same items
+                duplicate_of = self.find_duplicate_frame(frame_info, kept_frames)
+                if duplicate_of:
+                    frame_info['duplicate_of'] = duplicate_of
                 
-                # Extract frame at intervals
-                if frame_count % frame_interval == 0:
-                    # Convert frame to JPEG
-                    _, buffer = cv2.imencode('.jpg', frame)
-                    frame_base64 = base64.b64encode(buffer).decode('utf-8')
-                    
-                    timestamp = frame_count / fps if fps > 0 else extracted_count * 2
-                    
-                    frames.append({
-                        'id': f"frame_{extracted_count}",
-                        'timestamp': timestamp,
-                        'frame_data': frame_base64,
-                        'frame_number': frame_count,
-                        'items': []
-                    })
-                    
-                    extracted_count += 1
-                    print(f"Extracted frame {extracted_count} at {timestamp:.1f}s")
+                if on_frame:
+                    await on_frame(frame_info)
+                
+                if duplicate_of:
+                    print(f"Skipped near-duplicate frame {frame_info['id']} (same view as {duplicate_of})")
+                    continue
+                
+                kept_frames.append(frame_info)
                 
-                frame_count += 1
+                if known_detections and frame_info['id'] in known_detections:
+                    cached_objects = [{**obj, 'frame_data': frame_info['frame_data']}
+                                      for obj in known_detections[frame_info['id']]]
+                else:
+                    cached_objects = await self._cached_detections(frame_info, mode)
+                if cached_objects is not None:
+                    if on_detections:
+                        await on_detections(frame_info, cached_objects)
+                    frame_results.append(cached_objects)
+                    continue
+                
+                pending_batch.append(frame_info)
+                if len(pending_batch) >= batch_size:
+                    submit_pending_batch()
             
-            cap.release()
+            if pending_batch:
+                submit_pending_batch()
             
-            # Clean up temporary file
-            try:
-                os.unlink(temp_video_path)
-            except:
-                pass
-            
-            print(f"Extracted {len(frames)} frames from video")
-            return frames
+            await asyncio.gather(*detection_tasks)
             
-        except Exception as e:
-            raise Exception(f"Error extracting frames: {str(e)}")
+        except BaseException:
+            for task in detection_tasks:
+                task.cancel()
+            raise
+        
+        detected_objects = [
+            obj for result in frame_results
+            for obj in (result.result() if isinstance(result, asyncio.Task) else result)
+        ]
+        cached_frames = sum(1 for result in frame_results if not isinstance(result, asyncio.Task))
+        if cached_frames:
+            print(f"Reused cached detections for {cached_frames} of {len(kept_frames)} frames")
+        print(f"Detected {len(detected_objects)} objects across all frames")
+        return detected_objects
     
-    async def detect_objects(self, frames: List[Dict]) -> List[Dict]:
+    async def detect_objects(self, frames: List[Dict], max_concurrency: Optional[int] = None,
+                             detection_mode: Optional[str] = None) -> List[Dict]:
         """Detect objects in video frames using Nebius vision model"""
         
+        async def frame_stream():
+            for frame_info in frames:
+                yield frame_info
+        
+        return await self.detect_objects_streaming(frame_stream(), max_concurrency=max_concurrency,
+                                                   detection_mode=detection_mode)
+    
+    async def detect_objects_in_frame(self, frame_info: Dict) -> List[Dict]:
+        """Detect objects in a single video frame using Nebius vision model"""
+        
         detected_objects = []
         
-        for frame_info in frames:
+        try:
+            ai_response = await self._request_detections(frame_info['frame_data'], self._detection_prompt())
+            print(f"AI response for frame {frame_info['id']}: {ai_response[:200]}...")
+            
             try:
-                prompt = """
-                Analyze this video frame and identify sellable household items that could be sold on a marketplace.
-                
-                Look for items like:
-                - Furniture (chairs, tables, sofas, beds, desks, bookshelves)
-                - Electronics (TVs, laptops, monitors, speakers, phones, tablets)
-                - Appliances (microwaves, toasters, blenders, coffee makers)
-                - Decor items (lamps, mirrors, picture frames, vases, clocks)
-                - Sports equipment (bicycles, exercise equipment)
-                - Books and magazines
-                - Clothing and accessories (jackets, shoes, bags)
-                
-                Return a JSON array of detected sellable items:
-                [
+                items = self._parse_detections(ai_response)
+                for item in items or []:
+                    detected_objects.append(self._detected_object(item, frame_info, ai_response))
+                if items is not None:
+                    await self._cache_detections(frame_info, items, "frame")
+                        
+            except json.JSONDecodeError as e:
+                print(f"JSON parsing error: {e}")
+                # Fallback: try to extract items from text
+                self._extract_items_from_text(ai_response, frame_info, detected_objects)
+            
+        except Exception as e:
+            print(f"Error detecting objects in frame {frame_info['id']}: {str(e)}")
+            # Lets callers tell a failed request apart from a frame with nothing in it
+            frame_info['detection_error'] = str(e)
+        
+        return detected_objects
+    
+    async def detect_objects_in_mosaic(self, frame_batch: List[Dict]) -> List[List[Dict]]:
+        """Detect objects in several frames with one vision-model call on a numbered grid image.
+        
+        Returns one list of objects per frame, in batch order; each object is
+        mapped back to the frame (and timestamp) of the tile it was seen in.
+        If the grid response can't be used, the batch is detected frame by frame.
+        """
+        
+        frame_ids = ", ".join(frame['id'] for frame in frame_batch)
+        
+        try:
+            mosaic_data, layout = await asyncio.to_thread(
+                build_mosaic, [frame['frame_data'] for frame in frame_batch],
+                config.VISION_MOSAIC_TILE_EDGE, config.VIDEO_JPEG_QUALITY
+            )
+            ai_response = await self._request_detections(mosaic_data, self._detection_prompt(len(frame_batch)))
+            print(f"AI response for mosaic of {layout['rows']}x{layout['columns']} tiles ({frame_ids}): {ai_response[:200]}...")
+            items = self._parse_detections(ai_response)
+            
+        except Exception as e:
+            print(f"Error detecting objects in mosaic ({frame_ids}), falling back to per-frame detection: {str(e)}")
+            return list(await asyncio.gather(*(self.detect_objects_in_frame(frame) for frame in frame_batch)))
+        
+        # A response without an array gives no objects and isn't cached, so these frames are asked about again later
+        parsed = items is not None
+        frame_items = [[] for _ in frame_batch]
+        for item in items or []:
+            try:
+                tile = int(item.pop('tile', 0))
+            except (TypeError, ValueError):
+                tile = 0
+            if not 1 <= tile <= len(frame_batch):
+                print(f"Dropped '{item.get('object_name', 'unknown')}' with invalid tile")
+                continue
+            frame_items[tile - 1].append(item)
+        
+        frame_objects = []
+        for frame_info, items in zip(frame_batch, frame_items):
+            frame_objects.append([self._detected_object(item, frame_info, ai_response) for item in items])
+            if parsed:
+                await self._cache_detections(frame_info, items, "mosaic")
+        
+        return frame_objects
+    
+    def _detection_prompt(self, tile_count: int = 0) -> str:
+        """Prompt for a single frame, or for a grid of ``tile_count`` numbered frames"""
+        
+        if tile_count:
+            return DETECTION_PROMPT + MOSAIC_PROMPT.format(tile_count=tile_count)
+        return DETECTION_PROMPT
+    
+    async def _request_detections(self, image_data: ImageData, prompt: str) -> str:
+        """Send one image to the vision model and return its text response"""
+        
+        async with get_vision_call_limit():
+            response = await self.client.chat.completions.create(
+                model=self.vision_model,
+                max_tokens=1024,
+                temperature=0.3,
+                messages=[
                     {
-                        "object_name": "specific item name",
-                        "category": "furniture/electronics/appliances/decor/sports/books/clothing",
-                        "confidence": 0.85,
-                        "condition": "excellent/good/fair/poor",
-                        "estimated_value": 50,
-                        "description": "brief description of the item"
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": prompt
+                            },
+                            {
+                                "type": "image_url",
+                                "image_url": {
+                                    "url": image_data_url(image_data)
+                                }
+                            }
+                        ]
                     }
                 ]
-                
-                Only include items that would realistically be sellable on Facebook Marketplace or similar platforms.
-                Be specific with item names (e.g., "office chair" not just "chair").
-                Estimate realistic prices in USD.
-                """
-                
-                response = self.client.chat.completions.create(
-                    model="Qwen/Qwen2-VL-72B-Instruct",
-                    max_tokens=1024,
-                    temperature=0.3,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": prompt
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{frame_info['frame_data']}"
-                                    }
-                                }
-                            ]
-                        }
-                    ]
-                )
-                
-                ai_response = response.choices[0].message.content
-                print(f"AI response for frame {frame_info['id']}: {ai_response[:200]}...")
-                
-                try:
-                    # Parse JSON response
-                    start_idx = ai_response.find('[')
-                    end_idx = ai_response.rfind(']') + 1
-                    if start_idx != -1 and end_idx != 0:
-                        json_str = ai_response[start_idx:end_idx]
-                        items = json.loads(json_str)
-                        
-                        for item in items:
-                            detected_objects.append({
-                                'timestamp': frame_info['timestamp'],
-                                'frame_id': frame_info['id'],
-                                'frame_data': frame_info['frame_data'],
-                                'object_name': item.get('object_name', 'unknown'),
-                                'category': item.get('category', 'misc'),
-                                'confidence': float(item.get('confidence', 0.8)),
-                                'condition': item.get('condition', 'good'),
-                                'estimated_value': float(item.get('estimated_value', 50)),
-                                'description': item.get('description', ''),
-                                'ai_response': ai_response
-                            })
-                            
-                except json.JSONDecodeError as e:
-                    print(f"JSON parsing error: {e}")
-                    # Fallback: try to extract items from text
-                    self._extract_items_from_text(ai_response, frame_info, detected_objects)
-                
-            except Exception as e:
-                print(f"Error detecting objects in frame {frame_info['id']}: {str(e)}")
-                continue
+            )
         
-        print(f"Detected {len(detected_objects)} objects across all frames")
-        return detected_objects
+        return response.choices[0].message.content
+    
+    def _cacheable(self, frame_info: Dict) -> bool:
+        """Whether a frame's detections can go in the detection cache.
+        
+        Flat, low-texture frames hash alike even when they come from different
+        videos, so they are always sent to the model.
+        """
+        
+        return (self.detection_cache is not None and bool(frame_info.get('cache_hash'))
+                and (frame_info.get('sharpness') or 0) >= config.DETECTION_CACHE_MIN_SHARPNESS)
+    
+    async def _cached_detections(self, frame_info: Dict, detection_mode: str) -> Optional[List[Dict]]:
+        """Objects for a frame from the detection cache, or None if it has to be sent to the model.
+        
+        Single-frame detections are reused in either mode; mosaic ones, which
+        see each frame at tile size, only in mosaic mode.
+        """
+        
+        if not self._cacheable(frame_info):
+            return None
+        
+        detection_modes = ("frame", "mosaic") if detection_mode == "mosaic" else ("frame",)
+        items = await asyncio.to_thread(
+            self.detection_cache.get, frame_info['cache_hash'], self.vision_model, DETECTION_PROMPT_VERSION,
+            detection_modes
+        )
+        if items is None:
+            return None
+        
+        ai_response = json.dumps(items)
+        return [self._detected_object(item, frame_info, ai_response) for item in items]
+    
+    async def _cache_detections(self, frame_info: Dict, items: List[Dict], detection_mode: str):
+        """Remember the items the model found in a frame"""
+        
+        if self._cacheable(frame_info):
+            await asyncio.to_thread(
+                self.detection_cache.put, frame_info['cache_hash'], self.vision_model, DETECTION_PROMPT_VERSION,
+                detection_mode, items
+            )
+    
+    def _parse_detections(self, ai_response: str) -> Optional[List[Dict]]:
+        """Items from the JSON array in a vision-model response, or None if it has no array.
+        
+        Raises JSONDecodeError if the array is malformed.
+        """
+        
+        start_idx = ai_response.find('[')
+        end_idx = ai_response.rfind(']') + 1
+        if start_idx == -1 or end_idx == 0:
+            return None
+        return json.loads(ai_response[start_idx:end_idx])
+    
+    def _detected_object(self, item: Dict, frame_info: Dict, ai_response: str) -> Dict:
+        """Detected-object record for an item the model found in a frame"""
+        
+        return {
+            'timestamp': frame_info['timestamp'],
+            'frame_id': frame_info['id'],
+            'frame_data': frame_info['frame_data'],
+            'image_id': frame_info.get('image_id'),
+            'frame_hash': frame_info.get('phash'),
+            'object_name': item.get('object_name', 'unknown'),
+            'category': item.get('category', 'misc'),
+            'confidence': float(item.get('confidence', 0.8)),
+            'condition': item.get('condition', 'good'),
+            'estimated_value': float(item.get('estimated_value', 50)),
+            'description': item.get('description', ''),
+            'bbox': normalize_bbox(item.get('bbox')),
+            'ai_response': ai_response
+        }
     
     def _extract_items_from_text(self, text: str, frame_info: Dict, detected_objects: List[Dict]):
         """Fallback method to extract items from AI response text"""
@@ -202,6 +608,8 @@ class VideoProcessor:
                     'timestamp': frame_info['timestamp'],
                     'frame_id': frame_info['id'],
                     'frame_data': frame_info['frame_data'],
+                    'image_id': frame_info.get('image_id'),
+                    'frame_hash': frame_info.get('phash'),
                     'object_name': item,
                     'category': self._get_category_for_item(item),
                     'confidence': 0.7,
@@ -246,30 +654,83 @@ class VideoProcessor:
     
     async def filter_sellable_items(self, detected_objects: List[Dict]) -> List[Dict]:
         """Filter and deduplicate sellable items"""
+        return self.merge_detections(detected_objects)
+    
+    def merge_detections(self, detected_objects: List[Dict]) -> List[Dict]:
+        """Item records for the detections so far, one per physical object.
         
-        # Group similar items and remove duplicates
-        unique_items = {}
+        Cheap enough to re-run every time a frame's detections arrive, which
+        is how partial results are published while a job is still running.
+        """
         
-        for obj in detected_objects:
-            item_key = f"{obj['object_name']}_{obj['category']}"
-            
+        # One item per physical object, matched across frames by box overlap, name and view
+        sellable_items = []
+        item_ids = set()
+        
+        for detections in self.item_deduplicator.group(detected_objects):
             # Keep the one with highest confidence
-            if item_key not in unique_items or obj['confidence'] > unique_items[item_key]['confidence']:
-                unique_items[item_key] = {
-                    'id': f"item_{len(unique_items)}",
-                    'name': obj['object_name'],
-                    'category': obj['category'],
-                    'timestamp': obj['timestamp'],
-                    'frame_id': obj['frame_id'],
-                    'frame_data': obj['frame_data'],
-                    'confidence': obj['confidence'],
-                    'estimated_price': obj['estimated_value'],
-                    'condition': obj.get('condition', 'good'),
-                    'description': obj.get('description', f"A {obj['object_name']} in {obj.get('condition', 'good')} condition"),
-                    'ai_response': obj.get('ai_response', '')
-                }
-        
-        sellable_items = list(unique_items.values())
+            obj = max(detections, key=lambda detection: detection['confidence'])
+            sellable_items.append({
+                'id': self.item_deduplicator.item_id(detections, item_ids),
+                'name': obj['object_name'],
+                'category': obj['category'],
+                'timestamp': obj['timestamp'],
+                'frame_id': obj['frame_id'],
+                'frame_data': obj['frame_data'],
+                'image_id': obj.get('image_id'),
+                'bbox': obj.get('bbox'),
+                'seen_in_frames': list(dict.fromkeys(detection['frame_id'] for detection in detections)),
+                'confidence': obj['confidence'],
+                'estimated_price': obj['estimated_value'],
+                'condition': obj.get('condition', 'good'),
+                'description': obj.get('description', f"A {obj['object_name']} in {obj.get('condition', 'good')} condition"),
+                'ai_response': obj.get('ai_response', '')
+            })
+        
         print(f"Found {len(sellable_items)} unique sellable items")
         
         return sellable_items
+    
+    async def crop_items(self, items: List[Dict]) -> List[Dict]:
+        """Replace each item's full frame with a padded crop of its bounding box, at listing resolution.
+        
+        The full frame stays available as ``source_frame_data`` (and
+        ``source_image_id``); items without a usable box keep the whole frame.
+        """
+        
+        def crop_all() -> List[Optional[tuple]]:
+            crops = []
+            for item in items:
+                if not item.get('bbox'):
+                    crops.append(None)
+                    continue
+                try:
+                    crops.append(crop_region(
+                        image_bytes(item['frame_data']), item['bbox'], config.ITEM_CROP_PADDING,
+                        config.ITEM_CROP_MIN_EDGE, config.ITEM_CROP_MAX_EDGE, config.VIDEO_JPEG_QUALITY
+                    ))
+                except Exception as e:
+                    print(f"Error cropping item '{item['name']}': {str(e)}")
+                    crops.append(None)
+            return crops
+        
+        crops = await asyncio.to_thread(crop_all)
+        
+        frame_bytes = crop_bytes = 0
+        for item, crop in zip(items, crops):
+            if crop is None:
+                continue
+            
+            crop_data, encoding = crop
+            frame_bytes += len(image_bytes(item['frame_data']))
+            crop_bytes += encoding['encoded_bytes']
+            
+            item['source_frame_data'] = item['frame_data']
+            item['source_image_id'] = item.get('image_id')
+            item['frame_data'] = crop_data
+            item['crop'] = encoding
+        
+        if crop_bytes:
+            print(f"Cropped {sum(crop is not None for crop in crops)} items: {frame_bytes} bytes of frames -> {crop_bytes} bytes of crops")
+        
+        return items
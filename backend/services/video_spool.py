@@ -0,0 +1,71 @@
+import aiofiles
+import hashlib
+import shutil
+from pathlib import Path
+from typing import Optional, Tuple
+from fastapi import UploadFile
+import config
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured size limit"""
+
+class VideoSpool:
+    """Job-scoped on-disk spool for uploaded videos"""
+
+    def __init__(self, spool_dir: str = None, chunk_size: int = None, max_bytes: int = None):
+        self.spool_dir = Path(spool_dir or config.VIDEO_SPOOL_DIR)
+        self.chunk_size = chunk_size or config.VIDEO_UPLOAD_CHUNK_SIZE
+        self.max_bytes = max_bytes or config.VIDEO_MAX_UPLOAD_BYTES
+
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+
+    def job_dir(self, job_id: str) -> Path:
+        """Get the spool directory owned by a job"""
+        return self.spool_dir / job_id
+
+    async def save_upload(self, file: UploadFile, job_id: str) -> Tuple[str, str]:
+        """Stream an upload to the job's spool directory in chunks.
+
+        Returns the file path and the SHA-256 of the content, hashed chunk by
+        chunk as it is written so the file is never read twice.
+        """
+
+        job_dir = self.job_dir(job_id)
+        job_dir.mkdir(parents=True, exist_ok=True)
+
+        suffix = Path(file.filename or "").suffix or ".mp4"
+        video_path = job_dir / f"video{suffix}"
+
+        bytes_written = 0
+        content_hash = hashlib.sha256()
+        try:
+            async with aiofiles.open(video_path, "wb") as spool_file:
+                while True:
+                    chunk = await file.read(self.chunk_size)
+                    if not chunk:
+                        break
+
+                    bytes_written += len(chunk)
+                    if bytes_written > self.max_bytes:
+                        raise UploadTooLargeError(
+                            f"File size must be less than {self.max_bytes // (1024 * 1024)}MB"
+                        )
+
+                    content_hash.update(chunk)
+                    await spool_file.write(chunk)
+        except Exception:
+            self.cleanup(job_id)
+            raise
+
+        print(f"Spooled {bytes_written} bytes for job {job_id} to {video_path}")
+        return str(video_path), content_hash.hexdigest()
+
+    def find_video(self, job_id: str) -> Optional[str]:
+        """Path of a job's spooled video, or None if it was never spooled or has been cleaned up"""
+
+        videos = sorted(self.job_dir(job_id).glob("video.*"))
+        return str(videos[0]) if videos else None
+
+    def cleanup(self, job_id: str):
+        """Remove everything spooled for a job"""
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
@@ -1,4 +1,4 @@
-import React, { useState } from 'react'
+import React, { useEffect, useState } from 'react'
 import { motion } from 'framer-motion'
 import { ArrowRight, Video } from 'lucide-react'
 
@@ -9,12 +9,16 @@ interface SellModeProps {
 type CurrentStep = 'upload' | 'processing' | 'items' | 'listings' | 'storefront'
 
 interface ExtractedItem {
+  id?: string
   name: string
   estimated_price: number
   category: string
   condition: string
   confidence?: number
   frame_data?: string
+  frame_url?: string
+  thumbnail_url?: string
+  version?: number
   timestamp?: number
 }
 
@@ -30,6 +34,7 @@ interface Storefront {
 export function SellMode({ onBack }: SellModeProps) {
   const [isUploading, setIsUploading] = useState(false)
   const [uploadProgress, setUploadProgress] = useState(0)
+  const [queuePosition, setQueuePosition] = useState<number | null>(null)
   const [jobId, setJobId] = useState<string | null>(null)
   const [extractedItems, setExtractedItems] = useState<ExtractedItem[]>([])
   const [storefront, setStorefront] = useState<Storefront | null>(null)
@@ -39,6 +44,17 @@ export function SellMode({ onBack }: SellModeProps) {
   const [loginCredentials, setLoginCredentials] = useState({ email: '', password: '' })
   const [error, setError] = useState<string | null>(null)
 
+  useEffect(() => {
+    if (currentStep !== 'processing' || !jobId) return
+
+    // Leaving the page mid-extraction cancels the job instead of letting it run for nobody
+    const cancelOnLeave = () => {
+      fetch(`http://localhost:8000/api/sell/jobs/${jobId}`, { method: 'DELETE', keepalive: true })
+    }
+    window.addEventListener('pagehide', cancelOnLeave)
+    return () => window.removeEventListener('pagehide', cancelOnLeave)
+  }, [currentStep, jobId])
+
   const handleVideoUpload = async (event: React.ChangeEvent<HTMLInputElement>) => {
     const file = event.target.files?.[0]
     if (!file) return
@@ -57,14 +73,19 @@ export function SellMode({ onBack }: SellModeProps) {
         body: formData,
       })
       
+      if (response.status === 429) {
+        const retryAfter = Number(response.headers.get('Retry-After')) || 60
+        throw new Error(`Too many videos are being processed right now. Please try again in about ${Math.ceil(retryAfter / 60)} min.`)
+      }
       if (!response.ok) {
         throw new Error(`Failed to upload video: ${response.statusText}`)
       }
       
       const data = await response.json()
       setJobId(data.job_id)
+      setQueuePosition(data.queue_position ?? null)
       
-      pollExtractionStatus(data.job_id)
+      watchExtraction(data.job_id)
       
     } catch (error) {
       console.error('Error uploading video:', error)
@@ -74,22 +95,88 @@ export function SellMode({ onBack }: SellModeProps) {
     }
   }
 
+  const watchExtraction = (jobId: string) => {
+    if (typeof EventSource === 'undefined') {
+      pollExtractionStatus(jobId)
+      return
+    }
+
+    // Each event only carries what changed, so items are kept by ID and patched
+    const items = new Map<string, ExtractedItem>()
+    const events = new EventSource(`http://localhost:8000/api/sell/extraction-events/${jobId}`)
+    let receivedEvent = false
+    let jobError: string | null = null
+
+    events.addEventListener('job', (event) => {
+      receivedEvent = true
+      const delta = JSON.parse((event as MessageEvent).data)
+      delta.items.forEach((item: ExtractedItem) => items.set(item.id || item.name, item))
+      delta.removed_items.forEach((itemId: string) => items.delete(itemId))
+      jobError = delta.error
+      setQueuePosition(delta.queue_position ?? null)
+      setUploadProgress(delta.progress || 0)
+      setExtractedItems(Array.from(items.values()))
+    })
+
+    events.addEventListener('end', (event) => {
+      events.close()
+      const status = JSON.parse((event as MessageEvent).data).status
+      if (status === 'deleted') {
+        return  // Cancelled by the user
+      }
+      setIsUploading(false)
+      if (status === 'completed') {
+        setCurrentStep('items')
+      } else {
+        setCurrentStep('upload')
+        setError(jobError || 'Extraction failed')
+      }
+    })
+
+    events.onerror = () => {
+      // After a dropped connection the browser reconnects and resumes from the
+      // last event ID by itself; only fall back to polling if streaming never worked
+      if (!receivedEvent) {
+        events.close()
+        pollExtractionStatus(jobId)
+      }
+    }
+  }
+
   const pollExtractionStatus = async (jobId: string) => {
+    // Each poll asks only for what changed since the last version seen
+    const items = new Map<string, ExtractedItem>()
+    let version = 0
+
     const interval = setInterval(async () => {
       try {
-        const response = await fetch(`http://localhost:8000/api/sell/extraction-status/${jobId}`)
+        const response = await fetch(
+          `http://localhost:8000/api/sell/extraction-status/${jobId}?since_version=${version}` +
+          '&fields=status,progress,queue_position,items,removed_items,error'
+        )
         
+        if (response.status === 304) {
+          return
+        }
+        if (response.status === 404) {
+          clearInterval(interval)  // Cancelled by the user
+          return
+        }
         if (!response.ok) {
           throw new Error(`Failed to get status: ${response.statusText}`)
         }
         
         const data = await response.json()
+        version = data.version
+        setQueuePosition(data.queue_position ?? null)
+        data.items.forEach((item: ExtractedItem) => items.set(item.id || item.name, item))
+        data.removed_items.forEach((itemId: string) => items.delete(itemId))
         setUploadProgress(data.progress || 0)
+        setExtractedItems(Array.from(items.values()))
         
         if (data.status === 'completed') {
           clearInterval(interval)
           setIsUploading(false)
-          setExtractedItems(data.items || [])
           setCurrentStep('items')
         } else if (data.status === 'failed') {
           clearInterval(interval)
@@ -158,7 +245,9 @@ export function SellMode({ onBack }: SellModeProps) {
   }
 
   const deleteItem = async (index: number) => {
-    if (!jobId) return
+    // Items are addressed by ID: their order here can differ from the server's
+    const itemId = extractedItems[index]?.id
+    if (!jobId || !itemId) return
     
     try {
       setError(null)
@@ -169,12 +258,12 @@ export function SellMode({ onBack }: SellModeProps) {
         },
         body: JSON.stringify({
           job_id: jobId,
-          item_index: index
+          item_id: itemId
         }),
       })
       
       if (response.ok) {
-        setExtractedItems(prev => prev.filter((_, i) => i !== index))
+        setExtractedItems(prev => prev.filter(item => item.id !== itemId))
       } else {
         throw new Error(`Failed to delete item: ${response.statusText}`)
       }
@@ -188,6 +277,7 @@ export function SellMode({ onBack }: SellModeProps) {
     if (!jobId || index >= extractedItems.length) return
     
     const item = extractedItems[index]
+    if (!item.id) return
     
     try {
       setError(null)
@@ -198,7 +288,7 @@ export function SellMode({ onBack }: SellModeProps) {
         },
         body: JSON.stringify({
           job_id: jobId,
-          item_index: index,
+          item_id: item.id,
           name: item.name,
           estimated_price: item.estimated_price
         }),
@@ -216,11 +306,21 @@ export function SellMode({ onBack }: SellModeProps) {
     }
   }
 
+  const cancelExtraction = () => {
+    if (jobId) {
+      // Stops the job's model calls and uploads and deletes what it stored
+      fetch(`http://localhost:8000/api/sell/jobs/${jobId}`, { method: 'DELETE' })
+        .catch(error => console.error('Error cancelling extraction:', error))
+    }
+    resetToUpload()
+  }
+
   const resetToUpload = () => {
     setCurrentStep('upload')
     setError(null)
     setIsUploading(false)
     setUploadProgress(0)
+    setQueuePosition(null)
     setJobId(null)
     setExtractedItems([])
     setStorefront(null)
@@ -339,15 +439,21 @@ export function SellMode({ onBack }: SellModeProps) {
                     </div>
                     
                     <p className="text-body text-white/60">
-                      {uploadProgress < 30 ? 'Extracting frames from video...' : 
-                       uploadProgress < 60 ? 'Detecting objects with AI...' : 
-                       uploadProgress < 80 ? 'Filtering sellable items...' : 
-                       uploadProgress < 100 ? 'Finalizing results...' :
+                      {queuePosition ? `Waiting in line (#${queuePosition})...` :
+                       uploadProgress < 10 ? 'Extracting frames from video...' : 
+                       uploadProgress < 80 ? 'Detecting objects with AI...' : 
+                       uploadProgress < 100 ? 'Saving items...' :
                        'Processing complete!'}
                     </p>
 
+                    {extractedItems.length > 0 && (
+                      <p className="text-body text-white/80">
+                        Found so far: {extractedItems.map(item => item.name).join(', ')}
+                      </p>
+                    )}
+
                     <button
-                      onClick={resetToUpload}
+                      onClick={cancelExtraction}
                       className="btn-secondary mt-4"
                     >
                       Cancel
@@ -386,9 +492,9 @@ export function SellMode({ onBack }: SellModeProps) {
 
                     <div className="space-y-4">
                       <div className="aspect-video bg-white/5 rounded-lg flex items-center justify-center">
-                        {item.frame_data ? (
+                        {item.thumbnail_url || item.frame_data ? (
                           <img 
-                            src={`data:image/jpeg;base64,${item.frame_data}`} 
+                            src={item.thumbnail_url ? `http://localhost:8000${item.thumbnail_url}` : `data:image/jpeg;base64,${item.frame_data}`} 
                             alt={item.name}
                             className="w-full h-full object-cover rounded-lg"
                           />